@@ -1,10 +1,11 @@
 from django.contrib import admin
-from .models import Card, Category, Interaction
+from .models import BackgroundTask, Card, Category, Interaction
 
 @admin.register(Card)
 class CardAdmin(admin.ModelAdmin):
-    list_display = ('id', 'title_en', 'title_ar')
+    list_display = ('id', 'title_en', 'title_ar', 'audio_status')
     search_fields = ('title_en', 'title_ar')
+    list_filter = ('audio_status',)
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -16,4 +17,9 @@ class InteractionAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'card', 'hour_range_start', 'hour_range_end', 'click_count')
     search_fields = ('user__username', 'card__title_en')
     list_filter = ('hour_range_start', 'hour_range_end')
-    
\ No newline at end of file
+    
+@admin.register(BackgroundTask)
+class BackgroundTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'key', 'status', 'attempts', 'max_attempts', 'run_at')
+    search_fields = ('name', 'key')
+    list_filter = ('name', 'status')
@@ -0,0 +1,95 @@
+import hashlib
+import logging
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import invalidate_catalog
+from .models import Card
+from .storage import SHARED_AUDIO_PREFIX
+from .tasks import task
+from .tts import get_tts_backend
+
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = (('ar', 'title_ar', 'audio_ar'), ('en', 'title_en', 'audio_en'))
+
+
+def get_audio_storage():
+    return Card._meta.get_field('audio_en').storage
+
+
+def normalize_phrase(text):
+    """
+    Normalize a card title for audio reuse: Unicode NFKC, collapsed
+    whitespace, case-folded.
+    """
+    return ' '.join(unicodedata.normalize('NFKC', text).split()).casefold()
+
+
+def audio_name(text, lang, voice):
+    """
+    Content-addressed storage name for `text` spoken in `lang` with `voice`.
+    """
+    digest = hashlib.sha256('\0'.join((voice, lang, normalize_phrase(text))).encode()).hexdigest()
+    return f'{SHARED_AUDIO_PREFIX}{digest[:2]}/{digest}.mp3'
+
+
+def mark_audio_failed(card_id):
+    Card.objects.filter(pk=card_id).update(audio_status=Card.AudioStatus.FAILED, updated_at=timezone.now())
+    transaction.on_commit(invalidate_catalog)
+
+
+@task('cards.generate_card_audio', on_failure=mark_audio_failed)
+def generate_card_audio(card_id):
+    """
+    Fill in the missing audio tracks of a card.
+
+    Phrases already in the content-addressed store are reused as-is; the
+    rest are synthesized, all languages at once. Tracks that succeed are
+    kept even if another language fails; the failure is re-raised so the
+    task is retried for what is still missing.
+    """
+    card = Card.objects.filter(pk=card_id).first()
+    if card is None:
+        return
+    backend = get_tts_backend()
+    storage = get_audio_storage()
+
+    changes = {}
+    missing = []
+    for lang, title_field, audio_field in LANGUAGES:
+        if getattr(card, audio_field):
+            continue
+        text = getattr(card, title_field)
+        name = audio_name(text, lang, backend.voice)
+        if storage.exists(name):
+            changes[audio_field] = name
+        else:
+            missing.append((lang, text, audio_field, name))
+
+    errors = []
+    if missing:
+        with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+            futures = [(lang, audio_field, name, pool.submit(backend.synthesize, text, lang))
+                       for lang, text, audio_field, name in missing]
+        for lang, audio_field, name, future in futures:
+            try:
+                content = future.result()
+            except Exception as e:
+                errors.append(e)
+                logger.warning("TTS for card %s (%s) failed: %s", card_id, lang, e)
+                continue
+            changes[audio_field] = storage.save_shared(name, ContentFile(content))
+
+    if not errors:
+        changes['audio_status'] = Card.AudioStatus.READY
+    # update() rather than save() so the card does not queue itself again
+    Card.objects.filter(pk=card_id).update(updated_at=timezone.now(), **changes)
+    transaction.on_commit(invalidate_catalog)
+    if errors:
+        raise errors[0]
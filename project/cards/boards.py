@@ -0,0 +1,193 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Func, IntegerField, Max, Min, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from .models import Board, Card
+from .serializers import BoardCardSerializer, CategorySerializer
+from .tasks import task
+
+
+def build_board_payload(cards, hour=None, model_version=None, scores=None, context=None):
+    """
+    Build the board-with-categories response body.
+
+    Categories are taken from the already loaded cards (which must have
+    `category` selected) instead of another query, and every category and
+    card is serialized exactly once. Pass `scores` to include the ranking
+    debug output.
+    """
+    context = context or {}
+    categories = {}
+    for card in cards:
+        categories.setdefault(card.category_id, card.category)
+    category_data = {
+        category.id: data
+        for category, data in zip(
+            categories.values(),
+            CategorySerializer(categories.values(), many=True, context=context).data,
+        )
+    }
+
+    card_context = {**context, 'categories': category_data}
+    payload = {
+        "hour_used": hour,
+        "model_version": model_version,
+        "cards": BoardCardSerializer(cards, many=True, context=card_context).data,
+        "categories": [category_data[pk] for pk in sorted(category_data)],
+    }
+    if scores is not None:
+        payload["debug_cards"] = [
+            {"id": card.id, "title_en": card.title_en, "score": score}
+            for card, score in zip(cards, scores)
+        ]
+    return payload
+
+
+def add_cards_to_all_boards(card_ids, chunk_size=None):
+    """
+    Add cards to every board with set-based inserts instead of one
+    board.cards.add() per board. Boards that use defaults are skipped:
+    default cards are already implicit members there.
+
+    Each chunk of board ids (BOARD_FANOUT_CHUNK_SIZE boards) is one
+    INSERT ... SELECT into the membership table that skips pairs already
+    present, plus one UPDATE bumping those boards' versions, committed
+    together; the query count does not grow with the number of boards
+    until a table outgrows a chunk. No m2m_changed signal is sent;
+    precomputed rankings score the new cards live until the next rebuild.
+    """
+    card_ids = sorted({int(pk) for pk in card_ids})
+    if not card_ids:
+        return
+    chunk_size = chunk_size or settings.BOARD_FANOUT_CHUNK_SIZE
+    bounds = Board.objects.filter(uses_defaults=False).aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+
+    qn = connection.ops.quote_name
+    Membership = Board.cards.through
+    membership = qn(Membership._meta.db_table)
+    board_col = qn(Membership._meta.get_field('board').column)
+    card_col = qn(Membership._meta.get_field('card').column)
+    boards = qn(Board._meta.db_table)
+    cards = qn(Card._meta.db_table)
+    sql = (
+        f"INSERT INTO {membership} ({board_col}, {card_col}) "
+        f"SELECT b.{qn('id')}, c.{qn('id')} FROM {boards} b CROSS JOIN {cards} c "
+        f"WHERE b.{qn('id')} >= %s AND b.{qn('id')} < %s AND b.{qn('uses_defaults')} = %s "
+        f"AND c.{qn('id')} IN ({', '.join(['%s'] * len(card_ids))}) "
+        f"AND NOT EXISTS (SELECT 1 FROM {membership} m "
+        f"WHERE m.{board_col} = b.{qn('id')} AND m.{card_col} = c.{qn('id')})"
+    )
+    for low in range(bounds['low'], bounds['high'] + 1, chunk_size):
+        high = low + chunk_size
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [low, high, False, *card_ids])
+            Board.objects.filter(id__gte=low, id__lt=high, uses_defaults=False).update(version=F('version') + 1)
+
+
+def card_ids_by_board(boards):
+    """
+    Resolve the card ids of many boards in a fixed number of queries.
+
+    `boards` is a list of (board_id, uses_defaults) pairs; returns
+    {board_id: [card_id, ...]}.
+    """
+    result = {board_id: [] for board_id, _ in boards}
+    for board_id, card_id in Board.cards.through.objects.filter(board_id__in=result).values_list('board_id', 'card_id'):
+        result[board_id].append(card_id)
+
+    implicit = [board_id for board_id, uses_defaults in boards if uses_defaults]
+    if implicit:
+        excluded = {board_id: set() for board_id in implicit}
+        for board_id, card_id in Board.excluded_cards.through.objects.filter(board_id__in=implicit).values_list('board_id', 'card_id'):
+            excluded[board_id].add(card_id)
+        defaults = list(Card.objects.filter(is_default=True).values_list('id', flat=True))
+        for board_id in implicit:
+            skip = excluded[board_id].union(result[board_id])
+            result[board_id] = [pk for pk in defaults if pk not in skip] + result[board_id]
+    return result
+
+
+def annotate_board_card_counts(users):
+    """
+    Annotate a User queryset with `board_card_count`, the number of cards
+    Board.get_cards() would return for each user's board (0 without a
+    board), as correlated subqueries in the same query.
+    """
+    Membership = Board.cards.through
+    Excluded = Board.excluded_cards.through
+    copied = (
+        Membership.objects.filter(board_id=OuterRef('board__id'))
+        .order_by().annotate(n=Func(F('id'), function='COUNT')).values('n')
+    )
+    implicit = (
+        Card.objects.filter(
+            Q(is_default=True) & ~Q(pk__in=Excluded.objects.filter(board_id=OuterRef(OuterRef('board__id'))).values('card_id'))
+            | Q(pk__in=Membership.objects.filter(board_id=OuterRef(OuterRef('board__id'))).values('card_id'))
+        )
+        .order_by().annotate(n=Func(F('id'), function='COUNT')).values('n')
+    )
+    return users.annotate(board_card_count=Case(
+        When(board__isnull=True, then=Value(0)),
+        When(board__uses_defaults=True, then=Coalesce(Subquery(implicit), 0)),
+        default=Coalesce(Subquery(copied), 0),
+        output_field=IntegerField(),
+    ))
+
+
+@task('cards.add_cards_to_all_boards')
+def fan_out_cards(card_ids):
+    add_cards_to_all_boards(card_ids)
+
+
+def board_version(board, *parts):
+    """
+    Return a short key that changes whenever the board's payload could.
+
+    Combines the board's membership version with the card count and the
+    latest card and category update stamps (one aggregate query over
+    Board.get_cards(), so implicit default cards count too) and any extra
+    `parts` the payload depends on, such as the ranking hour and model
+    version.
+    """
+    stamps = board.get_cards().aggregate(
+        card_count=Count('id'),
+        cards_updated=Max('updated_at'),
+        categories_updated=Max('category__updated_at'),
+    )
+    raw = '|'.join(str(value) for value in (board.pk, board.version, *stamps.values(), *parts))
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def cached_json_response(request, key, version, build):
+    """
+    Serve a JSON body that is fully determined by `version`.
+
+    The version is sent as the ETag. A matching If-None-Match gets a 304
+    without calling `build`; otherwise the rendered bytes come from the
+    cache, and `build()` is only rendered on a miss.
+    """
+    etag = quote_etag(version)
+    # Compression middleware may have weakened the tag the client echoes back
+    client_etags = [tag.removeprefix('W/') for tag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))]
+    if etag in client_etags or '*' in client_etags:
+        response = HttpResponseNotModified()
+    else:
+        cache_key = f'{key}:{version}'
+        body = cache.get(cache_key)
+        if body is None:
+            body = JSONRenderer().render(build())
+            cache.set(cache_key, body, settings.BOARD_CACHE_TIMEOUT)
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Clients may keep the body but must revalidate it on every open
+    response['Cache-Control'] = 'private, no-cache'
+    return response
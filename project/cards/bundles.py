@@ -0,0 +1,176 @@
+import json
+import logging
+import zipfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 1
+CHUNK_SIZE = 64 * 1024
+# A delta also covers rows stamped just before the previous bundle was read
+# but committed after it
+SINCE_MARGIN = timedelta(minutes=1)
+
+
+class _Sink:
+    """
+    Write-only file object that holds what ZipFile writes until drained.
+    Having no tell() makes ZipFile stream entries with data descriptors.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def history_key(board_id, version):
+    return f'board-bundle:{board_id}:{version}'
+
+
+def _image_name(obj, size):
+    if size:
+        names = (obj.image_variants or {}).get('sizes', {}).get(size, {})
+        for ext in ('webp', 'jpg', 'png'):
+            if ext in names:
+                return names[ext]
+    return obj.image.name or None
+
+
+def _asset(name):
+    return f'media/{name}' if name else None
+
+
+def build_bundle(board, since=None, size=''):
+    """
+    Return (manifest, files) for a board's offline bundle.
+
+    The manifest always describes the whole board; `files` lists the
+    (archive path, storage, name) of the media to ship. With `since` (the
+    version of a bundle the client already holds) only media of cards and
+    categories that are new to the board or changed since then are
+    shipped. If that bundle is no longer known, a full bundle is built.
+    `size` picks an image variant (see IMAGE_VARIANT_SIZES) instead of the
+    original images.
+    """
+    started = timezone.now()
+    version = str(int(started.timestamp() * 1000))
+    cards = list(board.get_cards().select_related('category').order_by('id'))
+    categories = {}
+    for card in cards:
+        categories.setdefault(card.category_id, card.category)
+
+    previous = cache.get(history_key(board.pk, since)) if since else None
+    if previous is not None and previous['size'] != size:
+        previous = None
+    if previous is not None:
+        since_time = datetime.fromtimestamp(int(since) / 1000, tz=dt_timezone.utc) - SINCE_MARGIN
+
+    def changed(obj, known):
+        return previous is None or obj.pk not in known or obj.updated_at > since_time
+
+    files = {}
+
+    def ship(field, name):
+        path = _asset(name)
+        if path and path not in files:
+            if not field.storage.exists(name):
+                logger.warning("Bundle for board %s: %s is missing", board.pk, name)
+                return
+            files[path] = (field.storage, name)
+
+    card_entries = []
+    known_cards = set(previous['cards']) if previous else set()
+    for card in cards:
+        image = _image_name(card, size)
+        audio_en = card.audio_en.name if card.audio_en else None
+        audio_ar = card.audio_ar.name if card.audio_ar else None
+        card_entries.append({
+            "id": card.id,
+            "title_en": card.title_en,
+            "title_ar": card.title_ar,
+            "category": card.category_id,
+            "is_default": card.is_default,
+            "image": _asset(image),
+            "audio_en": _asset(audio_en),
+            "audio_ar": _asset(audio_ar),
+            "updated_at": card.updated_at.isoformat(),
+        })
+        if changed(card, known_cards):
+            ship(card.image, image)
+            ship(card.audio_en, audio_en)
+            ship(card.audio_ar, audio_ar)
+
+    category_entries = []
+    known_categories = set(previous['categories']) if previous else set()
+    for pk in sorted(categories):
+        category = categories[pk]
+        image = _image_name(category, size)
+        category_entries.append({
+            "id": category.id,
+            "name_en": category.name_en,
+            "name_ar": category.name_ar,
+            "image": _asset(image),
+            "updated_at": category.updated_at.isoformat(),
+        })
+        if changed(category, known_categories):
+            ship(category.image, image)
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": version,
+        "delta": previous is not None,
+        "since": since if previous is not None else None,
+        "board_version": board.version,
+        "cards": card_entries,
+        "categories": category_entries,
+        "removed_cards": sorted(known_cards.difference(card.id for card in cards)),
+        "assets": sorted(files),
+    }
+    cache.set(
+        history_key(board.pk, version),
+        {'cards': [card.id for card in cards], 'categories': sorted(categories), 'size': size},
+        settings.BOARD_BUNDLE_HISTORY_TIMEOUT,
+    )
+    return manifest, [(path, storage, name) for path, (storage, name) in sorted(files.items())]
+
+
+def stream_bundle(manifest, files):
+    """
+    Yield a zip archive of manifest.json followed by `files`, one chunk at
+    a time; memory use does not grow with the bundle. Media is stored
+    uncompressed since images and MP3s are compressed already.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        archive.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False), compress_type=zipfile.ZIP_DEFLATED)
+        yield sink.drain()
+        for path, storage, name in files:
+            try:
+                source = storage.open(name, 'rb')
+            except FileNotFoundError:
+                logger.warning("Bundle: %s disappeared before it was sent", name)
+                continue
+            with source, archive.open(zipfile.ZipInfo(path, timezone.now().timetuple()[:6]), 'w') as target:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    target.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,107 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Card, Category
+from .serializers import CardSerializer, CategorySerializer
+
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CARD_FILE_FIELDS = ('image', 'audio_en', 'audio_ar')
+
+
+def catalog_stamp():
+    """
+    Return a short key that changes whenever the cached catalog could.
+
+    Built from the row count and latest update of cards and categories
+    (two aggregate queries), so an edit made by another process - a web
+    worker, the run_tasks worker, a management command - is picked up by
+    every process on its next read, even with a per-process cache.
+    """
+    cards = Card.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    categories = Category.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    raw = '|'.join(str(value) for value in (*cards.values(), *categories.values()))
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def _catalog_key(name):
+    # Entries live under a generation token and the database stamp;
+    # invalidation swaps the token, so a reader that rebuilt from stale rows
+    # can only write to a dead key.
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return f'catalog:{version}:{catalog_stamp()}:{name}'
+
+
+def _cached(name, build):
+    key = _catalog_key(name)
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.CATALOG_CACHE_TIMEOUT)
+    return value
+
+
+def invalidate_catalog():
+    """
+    Drop every cached catalog entry.
+    """
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def _absolute(request, url):
+    return request.build_absolute_uri(url) if url else url
+
+
+def _absolute_variants(request, variants):
+    return {
+        label: {ext: _absolute(request, url) for ext, url in urls.items()}
+        for label, urls in variants.items()
+    }
+
+
+def _with_absolute_urls(items, request, fields):
+    # Cached data holds relative media URLs so it can be shared across hosts
+    if request is None:
+        return items
+    result = []
+    for item in items:
+        item = {**item, **{field: _absolute(request, item[field]) for field in fields}}
+        item['image_variants'] = _absolute_variants(request, item['image_variants'])
+        if item.get('category'):
+            item['category'] = {
+                **item['category'],
+                'image': _absolute(request, item['category']['image']),
+                'image_variants': _absolute_variants(request, item['category']['image_variants']),
+            }
+        result.append(item)
+    return result
+
+
+def get_default_card_data(request=None):
+    """
+    Return the serialized default cards, as CardSerializer renders them.
+    """
+    cards = _cached('default-cards', lambda: [
+        dict(item) for item in CardSerializer(
+            Card.objects.filter(is_default=True).select_related('category'), many=True,
+        ).data
+    ])
+    return _with_absolute_urls(cards, request, CARD_FILE_FIELDS)
+
+
+def get_category_data(request=None):
+    """
+    Return all serialized categories, as CategorySerializer renders them.
+    """
+    categories = _cached('categories', lambda: [
+        dict(item) for item in CategorySerializer(Category.objects.all(), many=True).data
+    ])
+    return _with_absolute_urls(categories, request, ('image',))
+
@@ -0,0 +1,291 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import time
+
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Card, Interaction
+
+
+logger = logging.getLogger(__name__)
+
+
+def hour_range(moment=None):
+    """
+    Return the (hour_range_start, hour_range_end) bucket holding `moment`
+    (an aware datetime, default now) in the server's TIME_ZONE.
+
+    Every path that buckets clicks or picks the ranking hour goes through
+    this, so they all agree on the current hour.
+    """
+    hour = timezone.localtime(moment).hour
+    return time(hour=hour), time(hour=(hour + 1) % 24)
+
+
+def bulk_increment_interactions(rows):
+    """
+    Add click counts to Interaction rows with one upsert per batch.
+
+    `rows` maps (user_id, card_id, hour_range_start) to
+    (click_count, hour_range_end). Missing rows are inserted; existing
+    ones get click_count = click_count + n on the unique_user_card_hour
+    constraint, so concurrent writers never lose increments. Both paths
+    stamp updated_at.
+    """
+    if not rows:
+        return
+    ops = connection.ops
+    opts = Interaction._meta
+    table = ops.quote_name(opts.db_table)
+    columns = [opts.get_field(name).column for name in (
+        'user', 'card', 'hour_range_start', 'hour_range_end', 'click_count', 'timestamp', 'updated_at',
+    )]
+    user_col, card_col, start_col, end_col, clicks_col, _, updated_col = (ops.quote_name(c) for c in columns)
+
+    if connection.vendor == 'mysql':
+        conflict = (
+            f"ON DUPLICATE KEY UPDATE {clicks_col} = {clicks_col} + VALUES({clicks_col}), "
+            f"{end_col} = VALUES({end_col}), {updated_col} = VALUES({updated_col})"
+        )
+    else:
+        conflict = (
+            f"ON CONFLICT ({user_col}, {card_col}, {start_col}) DO UPDATE SET "
+            f"{clicks_col} = {table}.{clicks_col} + excluded.{clicks_col}, "
+            f"{end_col} = excluded.{end_col}, {updated_col} = excluded.{updated_col}"
+        )
+
+    now = ops.adapt_datetimefield_value(timezone.now())
+    values = [
+        (user_id, card_id, ops.adapt_timefield_value(start), ops.adapt_timefield_value(end), clicks, now, now)
+        for (user_id, card_id, start), (clicks, end) in rows.items()
+    ]
+    batch_size = max(ops.bulk_batch_size(columns, values) or len(values), 1)
+    placeholder = f"({', '.join(['%s'] * len(columns))})"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(values), batch_size):
+            batch = values[i:i + batch_size]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(ops.quote_name(c) for c in columns)}) "
+                f"VALUES {', '.join([placeholder] * len(batch))} {conflict}",
+                [param for row in batch for param in row],
+            )
+
+
+class ClickBuffer:
+    """
+    In-process write-behind buffer for click increments.
+
+    Clicks are summed per (user, card, hour) and written by a background
+    thread every `flush_interval` seconds, or as soon as `max_pending`
+    distinct rows are waiting, with one bulk upsert. Request threads never
+    write. At most one interval of clicks is lost if the process dies;
+    pending clicks are flushed on normal interpreter shutdown.
+    """
+
+    def __init__(self, flush_interval=2.0, max_pending=1000, max_attempts=3):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._pending = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def add(self, user_id, card_id, hour_start, hour_end, clicks):
+        self._ensure_running()
+        with self._lock:
+            entry = self._pending.get((user_id, card_id, hour_start))
+            self._pending[(user_id, card_id, hour_start)] = ((entry[0] if entry else 0) + clicks, hour_end)
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Write all pending increments and return whether that succeeded.
+
+        If the bulk upsert fails, rows are written one at a time so one bad
+        row cannot hold back the rest. Rows whose user or card is gone are
+        dropped; rows that fail otherwise (the database is unavailable) are
+        put back for the next flush, at most `max_attempts` times.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return True
+            try:
+                bulk_increment_interactions(batch)
+            except Exception:
+                logger.warning("Bulk flush of %d buffered interaction rows failed; writing them one by one",
+                               len(batch), exc_info=True)
+            else:
+                self._forget(batch)
+                return True
+
+            failed = {}
+            rows = iter(batch.items())
+            for key, value in rows:
+                try:
+                    bulk_increment_interactions({key: value})
+                except IntegrityError:
+                    logger.warning("Dropping %d buffered clicks of user %s on card %s, which no longer exist",
+                                   value[0], key[0], key[1])
+                except Exception:
+                    # The database itself is failing; keep the rest for later
+                    logger.exception("Failed to flush buffered interaction rows")
+                    failed[key] = value
+                    failed.update(rows)
+                    break
+            self._forget(key for key in batch if key not in failed)
+            self._requeue(failed)
+            return not failed
+
+    def close(self):
+        self._stopped.set()
+        self._wake.set()
+        self.flush()
+
+    def _forget(self, keys):
+        with self._lock:
+            for key in keys:
+                self._attempts.pop(key, None)
+
+    def _requeue(self, rows):
+        dropped = 0
+        with self._lock:
+            for key, (clicks, hour_end) in rows.items():
+                attempts = self._attempts.get(key, 0) + 1
+                if attempts >= self.max_attempts:
+                    self._attempts.pop(key, None)
+                    dropped += clicks
+                    continue
+                self._attempts[key] = attempts
+                entry = self._pending.get(key)
+                self._pending[key] = ((entry[0] if entry else 0) + clicks, hour_end)
+        if dropped:
+            logger.error("Dropped %d buffered clicks after %d failed flushes", dropped, self.max_attempts)
+
+    def _ensure_running(self):
+        # A forked worker inherits the object but not the thread.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pending = {}
+            self._attempts = {}
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='click-buffer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            if not self.flush():
+                # Don't retry on every add while the database is failing
+                self._stopped.wait(self.flush_interval)
+            connection.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_click_buffer():
+    """
+    Return the process-wide click buffer, or None when buffering is off.
+    """
+    global _buffer
+    interval = getattr(settings, 'INTERACTION_FLUSH_INTERVAL', 0)
+    if not interval:
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ClickBuffer(
+                    interval,
+                    getattr(settings, 'INTERACTION_BUFFER_MAX_PENDING', 1000),
+                    getattr(settings, 'INTERACTION_FLUSH_MAX_ATTEMPTS', 3),
+                )
+                atexit.register(_buffer.close)
+    return _buffer
+
+
+def ingest_click_events(user, events):
+    """
+    Apply a batch of offline click events for `user` in one transaction.
+
+    Each event is a dict with `card`, an optional ISO `timestamp` (default
+    now) and an optional `click_count` (default 1). Valid events are
+    bucketed into hour ranges, summed per (card, hour) and upserted
+    together; invalid ones are skipped. Returns one status dict per event,
+    in input order.
+    """
+    results = []
+    parsed = []
+    for index, event in enumerate(events):
+        try:
+            if not isinstance(event, dict):
+                raise ValueError("Event must be an object.")
+            try:
+                card_id = int(event['card'])
+            except (TypeError, ValueError):
+                raise ValueError("card must be a card id.")
+            try:
+                click_count = int(event.get('click_count', 1))
+            except (TypeError, ValueError):
+                click_count = 0
+            if click_count < 1:
+                raise ValueError("click_count must be a positive integer.")
+            timestamp = event.get('timestamp')
+            if timestamp:
+                moment = parse_datetime(str(timestamp))
+                if moment is None:
+                    raise ValueError("Invalid timestamp.")
+                if timezone.is_naive(moment):
+                    moment = timezone.make_aware(moment)
+            else:
+                moment = timezone.now()
+        except KeyError:
+            results.append({"index": index, "status": "error", "error": "card is required."})
+            continue
+        except ValueError as e:
+            results.append({"index": index, "status": "error", "error": str(e)})
+            continue
+        parsed.append((index, card_id, moment, click_count))
+        results.append(None)
+
+    visible = set(
+        Card.objects
+        .filter(id__in={card_id for _, card_id, _, _ in parsed})
+        .filter(models.Q(owner=user) | models.Q(owner__isnull=True))
+        .values_list('id', flat=True)
+    )
+
+    rows = {}
+    for index, card_id, moment, click_count in parsed:
+        if card_id not in visible:
+            results[index] = {"index": index, "status": "error", "error": "Card not found."}
+            continue
+        hour_start, hour_end = hour_range(moment)
+        key = (user.id, card_id, hour_start)
+        entry = rows.get(key)
+        rows[key] = ((entry[0] if entry else 0) + click_count, hour_end)
+        results[index] = {"index": index, "status": "ok"}
+
+    bulk_increment_interactions(rows)
+    return results
@@ -0,0 +1,35 @@
+# Image work for import_cards' process pool. Keep this module free of
+# Django imports: under the spawn start method (Windows, macOS) workers
+# import it without django.setup().
+import io
+
+from PIL import Image, UnidentifiedImageError
+
+
+def process_image(path, max_size):
+    """
+    Validate an image and shrink it to fit `max_size` pixels. Returns
+    (bytes, extension) or (None, error message).
+    """
+    try:
+        with Image.open(path) as image:
+            image.verify()
+        with Image.open(path) as image:
+            image.load()
+            if image.format == 'JPEG':
+                ext, options = 'jpg', {'quality': 85, 'optimize': True}
+            else:
+                # PNG, and anything else converted to PNG to keep transparency
+                ext, options = 'png', {'optimize': True}
+                if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+                    image = image.convert('RGBA')
+            if image.mode not in ('RGB', 'L') and ext == 'jpg':
+                image = image.convert('RGB')
+            image.thumbnail((max_size, max_size))
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG' if ext == 'jpg' else 'PNG', **options)
+            return buffer.getvalue(), ext
+    except FileNotFoundError:
+        return None, "image file not found"
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        return None, f"invalid image: {e}"
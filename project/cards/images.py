@@ -0,0 +1,135 @@
+import hashlib
+import io
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .tasks import enqueue, task
+
+
+# Model label -> (image field, variants field)
+IMAGE_FIELDS = {
+    'cards.Card': ('image', 'image_variants'),
+    'cards.Category': ('image', 'image_variants'),
+    'users.User': ('profile_picture', 'profile_picture_variants'),
+}
+
+
+def _encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def render_variants(fh, sizes):
+    """
+    Yield (label, extension, bytes) for every size in `sizes` (label ->
+    longest side in pixels): a WebP and a JPEG (PNG for transparent
+    images) fallback for clients without WebP. Images are never upscaled.
+    """
+    with Image.open(fh) as image:
+        image.load()
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        base = image.convert('RGBA' if has_alpha else 'RGB')
+    webp = features.check('webp')
+    for label, size in sizes.items():
+        variant = base.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)
+        if webp:
+            yield label, 'webp', _encode(variant, 'WEBP', quality=settings.IMAGE_VARIANT_QUALITY, method=4)
+        if has_alpha:
+            yield label, 'png', _encode(variant, 'PNG', optimize=True)
+        else:
+            yield label, 'jpg', _encode(variant, 'JPEG', quality=settings.IMAGE_VARIANT_QUALITY, optimize=True, progressive=True)
+
+
+def needs_variants(instance):
+    """
+    True if the instance's image changed since its variants were made.
+    The field's default image (e.g. the stock profile picture) gets none.
+    """
+    image_field, variants_field = IMAGE_FIELDS[instance._meta.label]
+    name = getattr(instance, image_field).name or ''
+    if name == instance._meta.get_field(image_field).default:
+        name = ''
+    return (getattr(instance, variants_field) or {}).get('source', '') != name
+
+
+def queue_variants(instance, force=False):
+    enqueue(
+        'cards.generate_image_variants',
+        key=f'image-variants:{instance._meta.label_lower}:{instance.pk}',
+        model=instance._meta.label, pk=instance.pk, force=force,
+    )
+
+
+@task('cards.generate_image_variants')
+def generate_image_variants(model, pk, force=False):
+    """
+    Render the size variants of an object's image and record their names.
+
+    Variant files live under variants/<model>/<pk>/<content hash>/, so a
+    new upload never reuses an old URL; the previous set is deleted once
+    the new one is recorded.
+    """
+    Model = apps.get_model(model)
+    image_field, variants_field = IMAGE_FIELDS[model]
+    instance = Model.objects.filter(pk=pk).first()
+    if instance is None or not (force or needs_variants(instance)):
+        return
+    file = getattr(instance, image_field)
+    storage = file.storage
+    old = getattr(instance, variants_field) or {}
+
+    variants = {'source': '', 'sizes': {}}
+    if file.name and file.name != Model._meta.get_field(image_field).default:
+        with file.open('rb') as fh:
+            data = fh.read()
+        folder = f"variants/{instance._meta.model_name}/{pk}/{hashlib.sha256(data).hexdigest()[:16]}"
+        for label, ext, content in render_variants(io.BytesIO(data), settings.IMAGE_VARIANT_SIZES):
+            name = f'{folder}/{label}.{ext}'
+            if storage.exists(name):
+                storage.delete(name)
+            variants['sizes'].setdefault(label, {})[ext] = storage.save(name, ContentFile(content))
+        variants['source'] = file.name
+
+    changes = {variants_field: variants}
+    if hasattr(instance, 'updated_at'):
+        changes['updated_at'] = timezone.now()
+    # Only record variants for the image they were made from
+    updated = Model.objects.filter(pk=pk, **{image_field: file.name}).update(**changes)
+    if not updated:
+        # Replaced meanwhile; the task queued for the new image takes over
+        return
+    from .catalog import invalidate_catalog
+    transaction.on_commit(invalidate_catalog)
+    delete_variant_files(old, storage, keep=variants)
+
+
+def delete_variant_files(variants, storage, keep=None):
+    """
+    Delete the files of a variants record, except names also in `keep`.
+    """
+    kept = {name for names in (keep or {}).get('sizes', {}).values() for name in names.values()}
+    for names in (variants or {}).get('sizes', {}).values():
+        for name in names.values():
+            if name not in kept:
+                storage.delete(name)
+
+
+def variant_urls(variants, storage, request=None):
+    """
+    Map a variants record to {label: {extension: url}}.
+    """
+    urls = {}
+    for label, names in (variants or {}).get('sizes', {}).items():
+        urls[label] = {}
+        for ext, name in names.items():
+            url = storage.url(name)
+            urls[label][ext] = request.build_absolute_uri(url) if request is not None else url
+    return urls
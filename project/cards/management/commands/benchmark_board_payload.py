@@ -0,0 +1,81 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from cards.boards import build_board_payload
+from cards.models import Card, Category
+from cards.serializers import CardSerializer, CategorySerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_payload(cards, hour):
+    # board_with_categories without a model before build_board_payload:
+    # every card serialized twice, categories fetched again with a join
+    categories = Category.objects.filter(cards__in=cards).distinct()
+    return {
+        "debug_cards": CardSerializer(cards, many=True).data,
+        "hour_used": hour,
+        "cards": CardSerializer(cards, many=True).data,
+        "categories": CategorySerializer(categories, many=True).data,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the size, CPU time and queries of the board-with-categories body as it '
+        'was built before build_board_payload and as it is now, on synthetic cards inside '
+        'a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,200', help='Board sizes in cards, comma separated')
+        parser.add_argument('--categories', type=int, default=15, help='Categories the cards are spread over')
+        parser.add_argument('--repeat', type=int, default=30, help='Bodies built per size and builder')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        tag = uuid.uuid4().hex[:8]
+        categories = Category.objects.bulk_create([
+            Category(image='cards/benchmark.png', name_en=f'bench {tag} {i}', name_ar=f'قياس {tag} {i}')
+            for i in range(options['categories'])
+        ])
+        Card.objects.bulk_create([
+            Card(image='cards/benchmark.png', title_en=f'bench {tag} {i}', title_ar=f'قياس {tag} {i}',
+                 category=categories[i % len(categories)], audio_status=Card.AudioStatus.READY)
+            for i in range(max(sizes))
+        ])
+        card_ids = list(Card.objects.filter(title_en__startswith=f'bench {tag} ').order_by('id').values_list('id', flat=True))
+
+        renderer = JSONRenderer()
+        self.stdout.write(f"{'cards':>6} {'builder':<8} {'bytes':>9} {'CPU ms':>8} {'queries':>8}")
+        for size in sizes:
+            cards = list(Card.objects.filter(id__in=card_ids[:size]).select_related('category'))
+            builders = (
+                ('before', lambda: legacy_payload(cards, 12)),
+                ('after', lambda: build_board_payload(cards, 12)),
+            )
+            for name, build in builders:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.process_time()
+                    with CaptureQueriesContext(connection) as queries:
+                        body = renderer.render(build())
+                    timings.append((time.process_time() - started) * 1000)
+                self.stdout.write(
+                    f"{size:>6} {name:<8} {len(body):>9,} {statistics.median(timings):>8.2f} {len(queries):>8}"
+                )
@@ -0,0 +1,67 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from sklearn.preprocessing import LabelEncoder
+from cards.ml import prepare_bundle, score_cards, serving_bundle
+from cards.rankers import ForestRanker
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare scoring a board one card at a time (LabelEncoder.transform plus '
+        'model.predict per card) with the single vectorized predict, on a forest '
+        'trained on synthetic clicks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000', help='Board sizes in cards, comma separated')
+        parser.add_argument('--users', type=int, default=200, help='Synthetic users')
+        parser.add_argument('--cards', type=int, default=1000, help='Synthetic cards (at least the largest board)')
+        parser.add_argument('--rows', type=int, default=50000, help='Synthetic (user, card, hour) training rows')
+        parser.add_argument('--n-estimators', type=int, default=100, help='Trees in the forest')
+        parser.add_argument('--repeat', type=int, default=5, help='Boards scored per size and method')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        n_cards = max(options['cards'], max(sizes))
+        rng = np.random.default_rng(42)
+        user_ids = rng.integers(1, options['users'] + 1, options['rows'])
+        card_ids = rng.integers(1, n_cards + 1, options['rows'])
+        hours = rng.integers(0, 24, options['rows'])
+        clicks = rng.poisson(3, options['rows']) + 1
+
+        le_user, le_card = LabelEncoder(), LabelEncoder()
+        X = np.column_stack([le_user.fit_transform(user_ids), le_card.fit_transform(card_ids), hours]).astype(np.float32)
+        started = time.perf_counter()
+        ranker = ForestRanker(n_estimators=options['n_estimators']).fit(X, clicks)
+        self.stdout.write(f" Trained {options['n_estimators']} trees on {options['rows']:,} rows in {time.perf_counter() - started:.1f}s")
+        model = ranker.model
+        bundle = prepare_bundle(serving_bundle(ranker, le_user, le_card))
+
+        def per_card(user_id, board, hour):
+            # The ranking loop this replaced: two sklearn calls per card
+            user_code = le_user.transform([user_id])[0]
+            return [model.predict([[user_code, le_card.transform([card_id])[0], hour]])[0] for card_id in board]
+
+        def vectorized(user_id, board, hour):
+            return score_cards(bundle, user_id, board, hour)
+
+        known_cards = le_card.classes_
+        self.stdout.write(f"{'cards':>6} {'per-card ms':>12} {'vectorized ms':>14} {'speedup':>8}")
+        for size in sizes:
+            results = {}
+            for name, method in (('per-card', per_card), ('vectorized', vectorized)):
+                timings = []
+                for i in range(options['repeat']):
+                    board = [int(card_id) for card_id in rng.choice(known_cards, size, replace=False)]
+                    user_id = int(le_user.classes_[i % len(le_user.classes_)])
+                    started = time.perf_counter()
+                    method(user_id, board, i % 24)
+                    timings.append((time.perf_counter() - started) * 1000)
+                results[name] = statistics.median(timings)
+            self.stdout.write(
+                f"{size:>6} {results['per-card']:>12.1f} {results['vectorized']:>14.2f} "
+                f"{results['per-card'] / results['vectorized']:>7.0f}x"
+            )
@@ -0,0 +1,76 @@
+import time
+import uuid
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from cards.models import Board, Card
+from users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare boards that copy default cards with boards that use them implicitly: '
+        'membership rows, creation time and read latency. Runs on throwaway users inside '
+        'a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boards', type=int, default=1000, help='Boards created per mode')
+        parser.add_argument('--reads', type=int, default=200, help='Boards read per mode in the latency test')
+        parser.add_argument('--changes', type=int, default=3, help='Cards each user removes and adds')
+
+    def handle(self, *args, **options):
+        defaults = list(Card.objects.filter(is_default=True))
+        extras = list(Card.objects.filter(is_default=False)[:options['changes']])
+        if not defaults:
+            raise CommandError("There are no default cards to benchmark with.")
+        self.stdout.write(f" {options['boards']} boards per mode, {len(defaults)} default cards")
+        self.stdout.write(f"{'mode':<10} {'rows':>9} {'rows/board':>10} {'create ms':>10} {'read p50 ms':>12} {'read p95 ms':>12}")
+        for mode in ('copies', 'defaults'):
+            try:
+                with transaction.atomic():
+                    self.run_mode(mode, defaults, extras, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run_mode(self, mode, defaults, extras, options):
+        Membership = Board.cards.through
+        Excluded = Board.excluded_cards.through
+        rows_before = Membership.objects.count() + Excluded.objects.count()
+        tag = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create([
+            User(username=f'bench-{tag}-{i}', email=f'bench-{tag}-{i}@example.invalid')
+            for i in range(options['boards'])
+        ])
+        uses_defaults = mode == 'defaults'
+        rng = np.random.default_rng(42)
+
+        started = time.perf_counter()
+        boards = []
+        for user in users:
+            board = Board.objects.create(user=user, uses_defaults=uses_defaults)
+            if not uses_defaults:
+                board.cards.set(defaults)
+            removed = [defaults[i] for i in rng.choice(len(defaults), min(options['changes'], len(defaults)), replace=False)]
+            board.remove_cards(*removed)
+            board.add_cards(*extras)
+            boards.append(board)
+        create_ms = (time.perf_counter() - started) * 1000 / len(boards)
+        rows = Membership.objects.count() + Excluded.objects.count() - rows_before
+
+        timings = []
+        for i in rng.choice(len(boards), min(options['reads'], len(boards)), replace=False):
+            started = time.perf_counter()
+            list(boards[i].get_cards().select_related('category'))
+            timings.append((time.perf_counter() - started) * 1000)
+
+        self.stdout.write(
+            f"{mode:<10} {rows:>9} {rows / len(boards):>10.1f} {create_ms:>10.2f} "
+            f"{np.percentile(timings, 50):>12.2f} {np.percentile(timings, 95):>12.2f}"
+        )
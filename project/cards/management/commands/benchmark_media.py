@@ -0,0 +1,81 @@
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+from cards.media import serve_media
+
+
+def consume(response):
+    """
+    Read a response body the way a WSGI server would; returns its size.
+    """
+    size = 0
+    for chunk in response:
+        size += len(chunk)
+    response.close()
+    return size
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare cards.media.serve_media with django.views.static.serve on generated "
+        "files: full downloads, byte ranges and revalidations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per case')
+        parser.add_argument('--sizes', default='16,256,4096', help='File sizes in KiB, comma separated')
+
+    def handle(self, *args, **options):
+        root = tempfile.mkdtemp(prefix='media-bench-')
+        try:
+            with override_settings(MEDIA_ROOT=root, MEDIA_OFFLOAD_HEADER=''):
+                self.run(root, options)
+        finally:
+            shutil.rmtree(root)
+
+    def run(self, root, options):
+        factory = RequestFactory()
+        views = [
+            ('static.serve', lambda request, path: serve(request, path, document_root=root)),
+            ('serve_media', serve_media),
+        ]
+        self.stdout.write(f"{'case':<22} {'view':<14} {'req/s':>9} {'MiB/s':>9} {'p95 ms':>8} {'status':>7}")
+        for kib in [int(size) for size in options['sizes'].split(',')]:
+            path = f'audio/tts/ab/{kib:064x}.mp3'
+            os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(root, path), 'wb') as fh:
+                fh.write(os.urandom(kib * 1024))
+            full = os.path.join(root, path)
+            mtime = time.gmtime(os.path.getmtime(full))
+            cases = [
+                (f'{kib} KiB full', {}),
+                (f'{kib} KiB range', {'HTTP_RANGE': f'bytes={kib * 512}-'}),
+                (f'{kib} KiB revalidate', {'HTTP_IF_MODIFIED_SINCE': time.strftime('%a, %d %b %Y %H:%M:%S GMT', mtime)}),
+            ]
+            for case, headers in cases:
+                for name, view in views:
+                    self.measure(case, name, view, factory, path, headers, options['requests'])
+
+    def measure(self, case, name, view, factory, path, headers, count):
+        timings = []
+        transferred = 0
+        status = None
+        for _ in range(count):
+            request = factory.get(f'/media/{path}', **headers)
+            started = time.perf_counter()
+            response = view(request, path)
+            transferred += consume(response)
+            timings.append(time.perf_counter() - started)
+            status = response.status_code
+        total = sum(timings)
+        p95 = statistics.quantiles(timings, n=20)[-1] * 1000 if count > 1 else total * 1000
+        self.stdout.write(
+            f"{case:<22} {name:<14} {count / total:>9,.0f} {transferred / total / 1024 / 1024:>9,.1f} "
+            f"{p95:>8.2f} {status:>7}"
+        )
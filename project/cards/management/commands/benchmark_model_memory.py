@@ -0,0 +1,104 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from sklearn.preprocessing import LabelEncoder
+from cards.ml import load_bundle, prepare_bundle, save_bundle, score_card_hours, serving_bundle
+from cards.rankers import ForestRanker
+
+
+def memory_kib(pid='self'):
+    """
+    Return (RSS, PSS) of a process in KiB from /proc/<pid>/smaps_rollup.
+    """
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as fh:
+        for line in fh:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0])
+    return fields['Rss'], fields['Pss']
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the memory that concurrent workers use for the click model when '
+        'each unpickles the sklearn forest (the old format) and when they share the '
+        'memory-mapped compact bundle. Linux only: reads /proc/<pid>/smaps_rollup.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent worker processes per format')
+        parser.add_argument('--users', type=int, default=2000, help='Synthetic users')
+        parser.add_argument('--cards', type=int, default=300, help='Synthetic cards')
+        parser.add_argument('--rows', type=int, default=60000, help='Synthetic (user, card, hour) training rows')
+        parser.add_argument('--n-estimators', type=int, default=100, help='Trees in the forest')
+        parser.add_argument('--worker', nargs=2, metavar=('FORMAT', 'PATH'), help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            return self.run_worker(*options['worker'], options['cards'])
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError("This benchmark needs /proc/<pid>/smaps_rollup (Linux).")
+
+        rng = np.random.default_rng(0)
+        user_ids = rng.integers(1, options['users'] + 1, options['rows'])
+        card_ids = rng.integers(1, options['cards'] + 1, options['rows'])
+        hours = rng.integers(0, 24, options['rows'])
+        clicks = rng.integers(1, 10, options['rows'])
+        le_user, le_card = LabelEncoder(), LabelEncoder()
+        X = np.column_stack([le_user.fit_transform(user_ids), le_card.fit_transform(card_ids), hours]).astype(np.float32)
+        ranker = ForestRanker(n_estimators=options['n_estimators']).fit(X, clicks)
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {
+                'pickle': os.path.join(directory, 'legacy.pkl'),
+                'compact': os.path.join(directory, 'compact.pkl'),
+            }
+            save_bundle({'model': ranker.model, 'le_user': le_user, 'le_card': le_card}, paths['pickle'])
+            save_bundle(serving_bundle(ranker, le_user, le_card), paths['compact'])
+
+            env = {**os.environ, 'PYTHONPATH': os.pathsep.join(path for path in sys.path if path)}
+            self.stdout.write(
+                f"{'format':<8} {'file MiB':>9} {'base RSS':>9} {'RSS MiB':>8} {'PSS MiB':>8}  "
+                f"(per worker, {options['workers']} workers)"
+            )
+            for name, path in paths.items():
+                command = [
+                    sys.executable, '-m', 'django', 'benchmark_model_memory',
+                    '--worker', name, path, '--cards', str(options['cards']),
+                ]
+                workers = [
+                    subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env)
+                    for _ in range(options['workers'])
+                ]
+                try:
+                    # Every worker has loaded and scored before any is measured
+                    baselines = [int(worker.stdout.readline().split()[1]) for worker in workers]
+                    usage = [memory_kib(worker.pid) for worker in workers]
+                finally:
+                    for worker in workers:
+                        worker.stdin.close()
+                        worker.wait()
+                self.stdout.write(
+                    f"{name:<8} {os.path.getsize(path) / 2 ** 20:>9.1f} {np.mean(baselines) / 1024:>9.1f} "
+                    f"{np.mean([rss for rss, _ in usage]) / 1024:>8.1f} {np.mean([pss for _, pss in usage]) / 1024:>8.1f}"
+                )
+
+    def run_worker(self, name, path, n_cards):
+        baseline, _ = memory_kib()
+        # The pickle format was loaded whole into every worker
+        bundle = prepare_bundle(joblib.load(path)) if name == 'pickle' else load_bundle(path)
+        card_ids = list(range(1, n_cards + 1))
+        hours = list(range(24))
+        # Touch every tree so the measured pages are the ones serving uses
+        for user_id in range(1, 21):
+            score_card_hours(bundle, user_id, card_ids, hours)
+        self.stdout.write(f"ready {baseline}")
+        self.stdout.flush()
+        sys.stdin.read()
@@ -0,0 +1,108 @@
+import statistics
+import time
+import uuid
+from datetime import time as dt_time
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from cards.models import Card, Category, Interaction
+from cards.pagination import NewestFirstPagination, OffsetPagination
+from users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare offset and keyset pagination of one user's interactions at increasing "
+        "depths, plus the NDJSON export rate, on synthetic rows inside a transaction that "
+        "is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Interactions to add')
+        parser.add_argument('--page-size', type=int, default=100, help='Rows per page')
+        parser.add_argument('--repeat', type=int, default=10, help='Page fetches per depth')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rows = options['rows']
+        started = time.perf_counter()
+        tag = uuid.uuid4().hex[:8]
+        user = User.objects.create(username=f'bench-{tag}', email=f'bench-{tag}@example.invalid')
+        category = Category.objects.first() or Category.objects.create(
+            image='cards/benchmark.png', name_en='Benchmark', name_ar='قياس',
+        )
+        # One row per (card, hour) keeps unique_user_card_hour satisfied
+        cards = Card.objects.bulk_create([
+            Card(image='cards/benchmark.png', title_en=f'bench {tag} {i}', title_ar=f'قياس {tag} {i}',
+                 category=category, audio_status=Card.AudioStatus.READY)
+            for i in range(-(-rows // 24))
+        ], batch_size=5000)
+        batch = []
+        for i in range(rows):
+            card, hour = cards[i // 24], i % 24
+            batch.append(Interaction(
+                user=user, card=card, click_count=1,
+                hour_range_start=dt_time(hour), hour_range_end=dt_time((hour + 1) % 24),
+            ))
+            if len(batch) >= 10000:
+                Interaction.objects.bulk_create(batch)
+                batch = []
+        Interaction.objects.bulk_create(batch)
+        self.stdout.write(f" Added {rows:,} interactions in {time.perf_counter() - started:.1f}s")
+
+        queryset = Interaction.objects.filter(user=user)
+        ids = list(queryset.order_by('-id').values_list('id', flat=True))
+        size = options['page_size']
+        factory = RequestFactory()
+        self.stdout.write(f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10} {'speedup':>8}")
+        for fraction in (0, 0.1, 0.5, 0.9, 0.999):
+            depth = min(int(rows * fraction), max(rows - size, 0))
+            offset_request = Request(factory.get('/', {'limit': size, 'offset': depth}))
+            offset_ms = self.time_page(OffsetPagination, queryset, offset_request, options['repeat'])
+
+            paginator = NewestFirstPagination()
+            paginator.base_url = 'http://testserver/'
+            params = {'page_size': size}
+            if depth:
+                url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=ids[depth - 1]))
+                params['cursor'] = parse_qs(urlparse(url).query)['cursor'][0]
+            keyset_request = Request(factory.get('/', params))
+            keyset_ms = self.time_page(NewestFirstPagination, queryset, keyset_request, options['repeat'])
+            self.stdout.write(f"{depth:>10,} {offset_ms:>10.2f} {keyset_ms:>10.2f} {offset_ms / keyset_ms:>7.1f}x")
+
+        started = time.perf_counter()
+        exported = 0
+        pk = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=pk).order_by('pk').values_list('pk', flat=True)[:2000])
+            if not chunk:
+                break
+            exported += len(chunk)
+            pk = chunk[-1]
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f" Keyset scan of all {exported:,} rows (export read path): {exported / elapsed:,.0f} rows/s")
+
+    def time_page(self, pagination_class, queryset, request, repeat):
+        timings = []
+        for _ in range(repeat):
+            paginator = pagination_class()
+            begin = time.perf_counter()
+            page = paginator.paginate_queryset(queryset, request)
+            paginator.get_paginated_response([obj.pk for obj in page])
+            timings.append((time.perf_counter() - begin) * 1000)
+        return statistics.median(timings)
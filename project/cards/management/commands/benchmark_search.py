@@ -0,0 +1,90 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from cards.models import Card, Category
+from cards.search import search_cards, search_columns
+
+
+ENGLISH = (
+    'apple', 'banana', 'orange', 'water', 'juice', 'bread', 'milk', 'happy', 'sad', 'angry',
+    'play', 'sleep', 'school', 'teacher', 'mother', 'father', 'brother', 'sister', 'car', 'bus',
+    'ball', 'book', 'chair', 'table', 'door', 'window', 'red', 'blue', 'green', 'yellow',
+)
+ARABIC = (
+    'تفاحة', 'موز', 'برتقال', 'ماء', 'عصير', 'خبز', 'حليب', 'سعيد', 'حزين', 'غاضب',
+    'ألعب', 'أنام', 'المدرسة', 'المعلم', 'أمي', 'أبي', 'أخي', 'أختي', 'سيارة', 'حافلة',
+    'كرة', 'كتاب', 'كرسي', 'طاولة', 'باب', 'نافذة', 'أحمر', 'أزرق', 'أخضر', 'أصفر', 'مستشفى',
+)
+QUERIES = ('app', 'apple juice', 'teach', 'تفاحه', 'مدرسة', 'اخضر', 'مُعَلِّم', 'zzz')
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the card search index with the icontains search it replaced on a synthetic '
+        'catalog, inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=100000, help='Synthetic cards to add')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query')
+        parser.add_argument('--page-size', type=int, default=50, help='Results fetched per search')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        category = Category.objects.first() or Category.objects.create(
+            image='cards/benchmark.png', name_en='Benchmark', name_ar='قياس',
+        )
+        rng = random.Random(42)
+        started = time.perf_counter()
+        batch = []
+        for i in range(options['cards']):
+            words = rng.sample(range(len(ENGLISH)), 2)
+            card = Card(
+                image='cards/benchmark.png',
+                title_en=f'{ENGLISH[words[0]]} {ENGLISH[words[1]]} {i}',
+                title_ar=f'{ARABIC[words[0]]} {ARABIC[words[1]]} {i}',
+                category=category,
+                audio_status=Card.AudioStatus.READY,
+            )
+            card.search_en, card.search_ar = search_columns(card.title_en, card.title_ar)
+            batch.append(card)
+            if len(batch) >= 5000:
+                Card.objects.bulk_create(batch)
+                batch = []
+        Card.objects.bulk_create(batch)
+        self.stdout.write(f" Added {options['cards']:,} cards in {time.perf_counter() - started:.1f}s")
+
+        def icontains(query):
+            # What rest_framework.filters.SearchFilter did for title_en/title_ar
+            condition = Q()
+            for term in query.split():
+                condition &= Q(title_en__icontains=term) | Q(title_ar__icontains=term)
+            return Card.objects.filter(condition)
+
+        self.stdout.write(f"{'query':<14} {'method':<10} {'hits':>7} {'p50 ms':>8} {'p95 ms':>8}")
+        for query in QUERIES:
+            for name, search in (('icontains', icontains), ('index', lambda q: search_cards(Card.objects.all(), q))):
+                timings = []
+                for _ in range(options['repeat']):
+                    begin = time.perf_counter()
+                    queryset = search(query)
+                    hits = queryset.count()
+                    list(queryset[:options['page_size']])
+                    timings.append((time.perf_counter() - begin) * 1000)
+                p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+                self.stdout.write(f"{query:<14} {name:<10} {hits:>7,} {statistics.median(timings):>8.2f} {p95:>8.2f}")
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from cards.ml import get_registry
+from cards.rankings import build_rankings
+
+
+class Command(BaseCommand):
+    help = 'Precompute every board\'s card order for each hour using the current click model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Boards ranked per database round trip')
+
+    def handle(self, *args, **options):
+        registry = get_registry()
+        registry.refresh()
+        bundle = registry.get()
+        if bundle is None:
+            self.stdout.write(self.style.WARNING(f"No model found at {settings.ML_MODEL_PATH}. Train one first."))
+            return
+
+        built = build_rankings(bundle, registry.version, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f" Ranked {built} boards with model {registry.version}"))
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from cards.boards import card_ids_by_board
+from cards.models import Board, Card
+
+
+class Command(BaseCommand):
+    help = (
+        'Convert boards between copied default cards and implicit defaults '
+        '(board = defaults - exclusions + additions). Board contents do not change.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--to', choices=['defaults', 'copies'], default='defaults',
+            help="'defaults' drops the per-board copies of default cards; 'copies' writes them back",
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Boards converted per transaction')
+
+    def handle(self, *args, **options):
+        Membership = Board.cards.through
+        Excluded = Board.excluded_cards.through
+        rows_before = Membership.objects.count() + Excluded.objects.count()
+        to_defaults = options['to'] == 'defaults'
+        defaults = set(Card.objects.filter(is_default=True).values_list('id', flat=True))
+
+        started = time.perf_counter()
+        board_ids = list(Board.objects.filter(uses_defaults=not to_defaults).order_by('id').values_list('id', flat=True))
+        for start in range(0, len(board_ids), options['batch_size']):
+            chunk = board_ids[start:start + options['batch_size']]
+            with transaction.atomic():
+                if to_defaults:
+                    current = card_ids_by_board([(board_id, False) for board_id in chunk])
+                    Membership.objects.filter(board_id__in=chunk, card_id__in=defaults).delete()
+                    Excluded.objects.bulk_create([
+                        Excluded(board_id=board_id, card_id=card_id)
+                        for board_id in chunk
+                        for card_id in defaults.difference(current[board_id])
+                    ], ignore_conflicts=True)
+                else:
+                    resolved = card_ids_by_board([(board_id, True) for board_id in chunk])
+                    Membership.objects.bulk_create([
+                        Membership(board_id=board_id, card_id=card_id)
+                        for board_id in chunk
+                        for card_id in resolved[board_id]
+                    ], ignore_conflicts=True)
+                    Excluded.objects.filter(board_id__in=chunk).delete()
+                Board.objects.filter(id__in=chunk).update(uses_defaults=to_defaults, version=F('version') + 1)
+
+        rows_after = Membership.objects.count() + Excluded.objects.count()
+        self.stdout.write(
+            f" Board card rows (additions + exclusions): {rows_before} -> {rows_after} "
+            f"({len(defaults)} default cards, {time.perf_counter() - started:.1f}s)"
+        )
+        self.stdout.write(self.style.SUCCESS(f" Converted {len(board_ids)} boards to {options['to']}"))
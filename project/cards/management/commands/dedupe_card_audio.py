@@ -0,0 +1,144 @@
+import posixpath
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from cards.audio import LANGUAGES, audio_name, get_audio_storage
+from cards.catalog import invalidate_catalog
+from cards.models import Card
+from cards.storage import SHARED_AUDIO_PREFIX
+from cards.tasks import enqueue
+from cards.tts import get_tts_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Move card audio into the content-addressed store, merge duplicate phrases, '
+        'delete unreferenced audio and report the bytes reclaimed. Existing files are '
+        'assumed to use the current TTS voice.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without touching anything')
+        parser.add_argument('--batch-size', type=int, default=500, help='Cards updated per transaction')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.storage = get_audio_storage()
+        self.voice = get_tts_backend().voice
+        self.stats = dict.fromkeys(
+            ['cards', 'moved', 'merged', 'orphans', 'dangling', 'queued', 'bytes'], 0,
+        )
+        self.referenced = set()
+        # Names that exist once this run is applied (a dry run writes nothing)
+        self.stored = set()
+
+        cards = Card.objects.order_by('pk').only('pk', 'title_en', 'title_ar', 'audio_en', 'audio_ar', 'audio_status')
+        batch = []
+        for card in cards.iterator(chunk_size=options['batch_size']):
+            batch.append(card)
+            if len(batch) >= options['batch_size']:
+                self.process(batch)
+                batch = []
+        self.process(batch)
+
+        self.remove_orphans()
+        self.queue_missing()
+
+        if self.stats['cards'] and not self.dry_run:
+            invalidate_catalog()
+
+        s = self.stats
+        prefix = "Would reclaim" if self.dry_run else "Reclaimed"
+        self.stdout.write(
+            f" {s['cards']} cards repointed, {s['moved']} files moved into the store, "
+            f"{s['merged']} duplicates merged, {s['orphans']} unreferenced files removed, "
+            f"{s['dangling']} missing files, {s['queued']} cards queued for generation"
+        )
+        self.stdout.write(self.style.SUCCESS(f" {prefix} {s['bytes']:,} bytes ({s['bytes'] / 1024 / 1024:.1f} MiB)"))
+
+    def process(self, cards):
+        """
+        Point a batch of cards at content-addressed names, copying the first
+        file seen for each phrase into the store and dropping the others.
+        """
+        updated = []
+        obsolete = []
+        for card in cards:
+            changed = False
+            for lang, title_field, audio_field in LANGUAGES:
+                current = getattr(card, audio_field).name
+                if not current:
+                    continue
+                target = audio_name(getattr(card, title_field), lang, self.voice)
+                if current == target:
+                    self.referenced.add(current)
+                    continue
+                if not self.storage.exists(current):
+                    # Regenerated by queue_missing() below
+                    self.stats['dangling'] += 1
+                    setattr(card, audio_field, None)
+                    card.audio_status = Card.AudioStatus.PENDING
+                    changed = True
+                    continue
+                if target in self.stored or self.storage.exists(target):
+                    self.stats['merged'] += 1
+                    self.stats['bytes'] += self.storage.size(current)
+                else:
+                    self.stats['moved'] += 1
+                    if not self.dry_run:
+                        with self.storage.open(current) as fh:
+                            self.storage.save_shared(target, fh)
+                self.stored.add(target)
+                self.referenced.add(target)
+                obsolete.append(current)
+                setattr(card, audio_field, target)
+                changed = True
+            if changed:
+                card.updated_at = timezone.now()
+                updated.append(card)
+
+        self.stats['cards'] += len(updated)
+        if self.dry_run or not updated:
+            return
+        with transaction.atomic():
+            Card.objects.bulk_update(updated, ['audio_en', 'audio_ar', 'audio_status', 'updated_at'])
+        for name in obsolete:
+            if not name.startswith(SHARED_AUDIO_PREFIX):
+                self.storage.delete(name)
+
+    def remove_orphans(self):
+        """
+        Delete content-addressed files no card points at any more.
+        """
+        # Cards written while this command ran must not lose their audio
+        for field in ('audio_en', 'audio_ar'):
+            self.referenced.update(
+                Card.objects.filter(**{f'{field}__startswith': SHARED_AUDIO_PREFIX}).values_list(field, flat=True)
+            )
+        if not self.storage.exists(SHARED_AUDIO_PREFIX.rstrip('/')):
+            return
+        dirs, _ = self.storage.listdir(SHARED_AUDIO_PREFIX)
+        for directory in dirs:
+            _, files = self.storage.listdir(posixpath.join(SHARED_AUDIO_PREFIX, directory))
+            for filename in files:
+                name = posixpath.join(SHARED_AUDIO_PREFIX, directory, filename)
+                if name in self.referenced:
+                    continue
+                self.stats['orphans'] += 1
+                self.stats['bytes'] += self.storage.size(name)
+                if not self.dry_run:
+                    self.storage.delete_shared(name)
+
+    def queue_missing(self):
+        """
+        Queue audio generation for cards that have no track in some language.
+        """
+        missing = Card.objects.filter(
+            Q(audio_en__isnull=True) | Q(audio_en='') | Q(audio_ar__isnull=True) | Q(audio_ar='')
+        ).values_list('pk', flat=True)
+        for pk in missing:
+            self.stats['queued'] += 1
+            if not self.dry_run:
+                enqueue('cards.generate_card_audio', key=f'card-audio:{pk}', card_id=pk)
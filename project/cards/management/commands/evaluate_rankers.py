@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+from cards.ml import load_click_features
+from cards.rankers import get_ranker, RANKERS
+
+
+def ndcg_at_k(true_clicks, scores, k):
+    """
+    NDCG@k of ranking items by `scores`, with the true clicks as gains.
+    """
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    top = np.argsort(-scores, kind='stable')[:k]
+    ideal = np.sort(true_clicks)[::-1][:k]
+    ideal_dcg = (ideal * discounts[:len(ideal)]).sum()
+    if ideal_dcg == 0:
+        return None
+    return (true_clicks[top] * discounts[:len(top)]).sum() / ideal_dcg
+
+
+class Command(BaseCommand):
+    help = 'Compare ranking engines offline: ranking quality on held-out interactions and inference latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engines', nargs='+', choices=list(RANKERS), default=list(RANKERS))
+        parser.add_argument('--test-size', type=float, default=0.2, help='Share of (user, card, hour) rows held out')
+        parser.add_argument('--k', type=int, default=5, help='Cutoff for NDCG@k')
+        parser.add_argument('--board-size', type=int, default=60, help='Cards per board in the latency test')
+        parser.add_argument('--repeats', type=int, default=200, help='Boards scored in the latency test')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        user_ids, card_ids, hours, clicks = load_click_features(options['chunk_size'])
+        if len(clicks) < 10:
+            self.stdout.write(self.style.WARNING("Not enough interaction data to evaluate."))
+            return
+
+        X = np.empty((len(clicks), 3), dtype=np.float32)
+        X[:, 0] = LabelEncoder().fit_transform(user_ids)
+        X[:, 1] = LabelEncoder().fit_transform(card_ids)
+        X[:, 2] = hours
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, clicks, test_size=options['test_size'], random_state=42,
+        )
+
+        # Held-out rows grouped into (user, hour) boards with at least two cards
+        keys = X_test[:, 0].astype(np.int64) * 24 + X_test[:, 2].astype(np.int64)
+        order = np.argsort(keys, kind='stable')
+        _, starts = np.unique(keys[order], return_index=True)
+        groups = [g for g in np.split(order, starts[1:]) if len(g) > 1]
+
+        rng = np.random.default_rng(42)
+        n_cards = int(X[:, 1].max()) + 1
+        boards = []
+        for _ in range(options['repeats']):
+            board = np.empty((options['board_size'], 3), dtype=np.float32)
+            board[:, 0] = rng.integers(0, int(X[:, 0].max()) + 1)
+            board[:, 1] = rng.integers(0, n_cards, options['board_size'])
+            board[:, 2] = rng.integers(0, 24)
+            boards.append(board)
+
+        self.stdout.write(
+            f" {len(X_train)} training rows, {len(X_test)} held out in {len(groups)} (user, hour) groups"
+        )
+        header = f"{'engine':<8} {'fit s':>8} {'size MiB':>9} {'NDCG@' + str(options['k']):>8} {'p50 ms':>8} {'p95 ms':>8}"
+        self.stdout.write(header)
+
+        for engine in options['engines']:
+            started = time.perf_counter()
+            ranker = get_ranker(engine)().fit(X_train, y_train)
+            fit_seconds = time.perf_counter() - started
+
+            # Evaluate what the workers would serve, not the training object
+            arrays = ranker.export()
+            size = sum(np.asarray(a).nbytes for a in arrays.values()) / 1024 / 1024
+            predictor = get_ranker(engine).load(arrays)
+
+            scores = predictor.predict(X_test)
+            ndcgs = [ndcg_at_k(y_test[g].astype(np.float64), scores[g], options['k']) for g in groups]
+            ndcgs = [v for v in ndcgs if v is not None]
+            ndcg = np.mean(ndcgs) if ndcgs else float('nan')
+
+            timings = []
+            for board in boards:
+                started = time.perf_counter()
+                predictor.predict(board)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            self.stdout.write(
+                f"{engine:<8} {fit_seconds:>8.2f} {size:>9.1f} {ndcg:>8.4f} "
+                f"{np.percentile(timings, 50):>8.2f} {np.percentile(timings, 95):>8.2f}"
+            )
@@ -9,7 +9,7 @@ class Command(BaseCommand):
     help = 'Generate fake interaction data only for cards in user boards (merge duplicates)'
 
     def handle(self, *args, **kwargs):
-        users = User.objects.prefetch_related("board__cards").all()
+        users = User.objects.select_related("board").all()
         created_count, updated_count = 0, 0
 
         for user in users:
@@ -17,7 +17,7 @@ class Command(BaseCommand):
             if not board:
                 continue
 
-            cards = list(board.cards.all())
+            cards = list(board.get_cards())
             if not cards:
                 continue
 
@@ -47,7 +47,7 @@ class Command(BaseCommand):
                 else:
                     interaction.click_count += clicks      # دمج الضغطات
                     interaction.hour_range_end = hour_end   # تحديث نهاية الساعة لو حابب
-                    interaction.save(update_fields=["click_count", "hour_range_end"])
+                    interaction.save(update_fields=["click_count", "hour_range_end", "updated_at"])
                     updated_count += 1
 
         self.stdout.write(
@@ -0,0 +1,33 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from cards.images import IMAGE_FIELDS, generate_image_variants, needs_variants, queue_variants
+
+
+class Command(BaseCommand):
+    help = 'Backfill resized image variants for existing cards, categories and profile pictures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', nargs='+', choices=list(IMAGE_FIELDS), default=list(IMAGE_FIELDS))
+        parser.add_argument('--inline', action='store_true', help='Render here instead of queueing tasks for run_tasks')
+        parser.add_argument('--force', action='store_true', help='Re-render objects whose variants are up to date')
+
+    def handle(self, *args, **options):
+        for label in options['models']:
+            Model = apps.get_model(label)
+            image_field, variants_field = IMAGE_FIELDS[label]
+            done = failed = 0
+            for instance in Model.objects.only('pk', image_field, variants_field).iterator(chunk_size=500):
+                if not options['force'] and not needs_variants(instance):
+                    continue
+                if not options['inline']:
+                    queue_variants(instance, force=options['force'])
+                    done += 1
+                    continue
+                try:
+                    generate_image_variants(label, instance.pk, force=options['force'])
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f" {label} {instance.pk}: {e}")
+            action = 'rendered' if options['inline'] else 'queued'
+            self.stdout.write(self.style.SUCCESS(f" {label}: {done} {action}, {failed} failed"))
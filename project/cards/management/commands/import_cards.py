@@ -0,0 +1,243 @@
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from cards.audio import generate_card_audio
+from cards.boards import add_cards_to_all_boards
+from cards.catalog import invalidate_catalog
+from cards.images import queue_variants
+from cards.imageproc import process_image
+from cards.models import Card, Category
+from cards.search import search_columns
+from cards.tasks import enqueue
+
+
+def read_manifest(path):
+    """
+    Return the manifest rows: a JSON list (or {"cards": [...]}) or a CSV
+    file with a header row.
+    """
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as fh:
+            rows = json.load(fh)
+        if isinstance(rows, dict):
+            rows = rows.get('cards', [])
+        return rows
+    with open(path, encoding='utf-8-sig', newline='') as fh:
+        return list(csv.DictReader(fh))
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+class Command(BaseCommand):
+    help = (
+        'Import cards from a CSV/JSON manifest (title_en, title_ar, category, image, is_default) '
+        'and an image directory. Interrupted imports resume from the checkpoint file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help='CSV or JSON file, one card per row')
+        parser.add_argument('images', help='Directory the manifest image paths are relative to')
+        parser.add_argument('--batch-size', type=int, default=200, help='Cards created per transaction')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes resizing images')
+        parser.add_argument('--max-size', type=int, default=1024, help='Longest image side in pixels')
+        parser.add_argument('--tts-workers', type=int, default=4, help='Cards voiced concurrently')
+        parser.add_argument('--defer-audio', action='store_true', help='Queue audio for the run_tasks worker instead')
+        parser.add_argument('--checkpoint', help='Progress file (default: <manifest>.checkpoint.json)')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+
+    def handle(self, *args, **options):
+        manifest = options['manifest']
+        self.images_dir = os.path.abspath(options['images'])
+        if not os.path.isdir(self.images_dir):
+            raise CommandError(f"Image directory not found: {self.images_dir}")
+        try:
+            rows = read_manifest(manifest)
+        except (OSError, ValueError, csv.Error) as e:
+            raise CommandError(f"Cannot read manifest: {e}")
+
+        checkpoint_path = options['checkpoint'] or f'{manifest}.checkpoint.json'
+        with open(manifest, 'rb') as fh:
+            digest = hashlib.sha256(fh.read()).hexdigest()
+        start = 0
+        if not options['restart'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, encoding='utf-8') as fh:
+                checkpoint = json.load(fh)
+            if checkpoint.get('manifest') == digest:
+                start = checkpoint.get('next_row', 0)
+                self.stdout.write(f" Resuming at row {start} of {len(rows)}")
+            else:
+                self.stdout.write(self.style.WARNING(" Manifest changed since the checkpoint; starting over."))
+
+        self.categories = {}
+        for category in Category.objects.all():
+            for key in (str(category.id), category.name_en.casefold(), category.name_ar):
+                self.categories[key] = category
+
+        self.stats = dict.fromkeys(['created', 'skipped', 'invalid'], 0)
+        started = time.perf_counter()
+        create_seconds = 0.0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for offset in range(start, len(rows), options['batch_size']):
+                batch = list(enumerate(rows[offset:offset + options['batch_size']], start=offset))
+                batch_started = time.perf_counter()
+                self.import_batch(batch, pool, options['max_size'])
+                create_seconds += time.perf_counter() - batch_started
+                self.save_checkpoint(checkpoint_path, digest, offset + len(batch))
+        invalidate_catalog()
+
+        imported = Card.objects.filter(
+            title_en__in=[str(row.get('title_en', '')).strip() for row in rows if isinstance(row, dict)],
+            audio_status=Card.AudioStatus.PENDING,
+        ).values_list('pk', flat=True)
+        audio_started = time.perf_counter()
+        voiced, failed = self.generate_audio(list(imported), options['tts_workers'], options['defer_audio'])
+        audio_seconds = time.perf_counter() - audio_started
+
+        total = time.perf_counter() - started
+        s = self.stats
+        self.stdout.write(
+            f" Cards: {s['created']} created, {s['skipped']} already present, {s['invalid']} invalid "
+            f"({s['created'] / max(create_seconds, 1e-9):,.1f} cards/sec)"
+        )
+        if options['defer_audio']:
+            self.stdout.write(f" Audio: {voiced} cards queued for the run_tasks worker")
+        else:
+            self.stdout.write(
+                f" Audio: {voiced} cards voiced, {failed} queued for retry "
+                f"({voiced / max(audio_seconds, 1e-9):,.1f} cards/sec)"
+            )
+        self.stdout.write(self.style.SUCCESS(f" Import finished in {total:.1f}s"))
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    def import_batch(self, batch, pool, max_size):
+        """
+        Validate, resize and create one batch of manifest rows.
+        """
+        candidates = []
+        for index, row in batch:
+            error = self.validate(row)
+            if error:
+                self.report(index, error)
+                continue
+            candidates.append((index, row))
+
+        # Rows already imported (or clashing with existing cards) are skipped
+        titles_en = [row['title_en'] for _, row in candidates]
+        titles_ar = [row['title_ar'] for _, row in candidates]
+        existing = set()
+        for title_en, title_ar in Card.objects.filter(
+            Q(title_en__in=titles_en) | Q(title_ar__in=titles_ar)
+        ).values_list('title_en', 'title_ar'):
+            existing.update((title_en, title_ar))
+        fresh = []
+        seen = set()
+        for index, row in candidates:
+            if row['title_en'] in existing or row['title_ar'] in existing:
+                self.stats['skipped'] += 1
+            elif row['title_en'] in seen or row['title_ar'] in seen:
+                self.report(index, "duplicate title in manifest")
+            else:
+                seen.update((row['title_en'], row['title_ar']))
+                fresh.append((index, row))
+
+        paths = [self.image_path(row['image']) for _, row in fresh]
+        results = pool.map(process_image, paths, [max_size] * len(paths), chunksize=8)
+
+        cards = []
+        for (index, row), (content, detail) in zip(fresh, results):
+            if content is None:
+                self.report(index, detail)
+                continue
+            card = Card(
+                title_en=row['title_en'],
+                title_ar=row['title_ar'],
+                category=row['category_obj'],
+                is_default=parse_bool(row.get('is_default')),
+            )
+            card.search_en, card.search_ar = search_columns(card.title_en, card.title_ar)
+            stem = os.path.splitext(os.path.basename(row['image']))[0]
+            card.image.save(f'{stem}.{detail}', ContentFile(content), save=False)
+            cards.append(card)
+
+        try:
+            with transaction.atomic():
+                Card.objects.bulk_create(cards)
+        except Exception:
+            for card in cards:
+                card.image.delete(save=False)
+            raise
+        self.stats['created'] += len(cards)
+        # bulk_create sends no post_save, so queue the resized variants here
+        for card in cards:
+            queue_variants(card)
+
+        defaults = [card.pk for card in cards if card.is_default]
+        if defaults:
+            add_cards_to_all_boards(defaults)
+
+    def validate(self, row):
+        if not isinstance(row, dict):
+            return "row must be an object"
+        for field in ('title_en', 'title_ar', 'category', 'image'):
+            row[field] = str(row.get(field) or '').strip()
+            if not row[field]:
+                return f"{field} is required"
+        category = self.categories.get(row['category']) or self.categories.get(row['category'].casefold())
+        if category is None:
+            return f"unknown category '{row['category']}'"
+        row['category_obj'] = category
+        if not self.image_path(row['image']).startswith(self.images_dir + os.sep):
+            return "image path escapes the image directory"
+        return None
+
+    def image_path(self, name):
+        return os.path.abspath(os.path.join(self.images_dir, name))
+
+    def report(self, index, error):
+        self.stats['invalid'] += 1
+        self.stderr.write(f" Row {index}: {error}")
+
+    def generate_audio(self, card_ids, workers, defer):
+        """
+        Voice the imported cards with at most `workers` cards in flight.
+        Cards that fail go to the task queue to be retried with backoff.
+        """
+        if defer:
+            for pk in card_ids:
+                enqueue('cards.generate_card_audio', key=f'card-audio:{pk}', card_id=pk)
+            return len(card_ids), 0
+
+        def voice(pk):
+            try:
+                generate_card_audio(pk)
+                return True
+            except Exception:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(voice, card_ids))
+        failed = [pk for pk, ok in zip(card_ids, results) if not ok]
+        for pk in failed:
+            enqueue('cards.generate_card_audio', key=f'card-audio:{pk}', card_id=pk)
+        return len(card_ids) - len(failed), len(failed)
+
+    def save_checkpoint(self, path, digest, next_row):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump({'manifest': digest, 'next_row': next_row}, fh)
+        os.replace(tmp_path, path)
@@ -0,0 +1,40 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from cards.tasks import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks (card audio and other deferred work) from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the tasks that are due now, then exit')
+        parser.add_argument('--batch-size', type=int, default=10, help='Tasks claimed per round trip')
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.BACKGROUND_TASK_POLL_INTERVAL,
+            help='Seconds to sleep when the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        total = 0
+        while not self.stopping:
+            close_old_connections()
+            ran = run_pending(options['batch_size'])
+            total += ran
+            if not ran:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f" Worker stopped after running {total} tasks"))
+
+    def stop(self, signum, frame):
+        # Finish the current batch, then exit
+        self.stopping = True
@@ -1,64 +1,165 @@
-from django.core.management.base import BaseCommand
+import sys
+import time
+
+import joblib
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from cards.models import Interaction
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
-import pandas as pd
-import joblib
-import os
 from django.conf import settings
+from cards.ml import load_click_features, save_bundle, serving_bundle
+from cards.rankers import ForestRanker, get_ranker, RANKERS
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_memory_mib():
+    """
+    Peak resident memory of this process in MiB, or None if unavailable.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere.
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def extend_encoder(encoder, ids):
+    """
+    Append ids the encoder has not seen and return the codes for `ids`.
+
+    Existing codes never move, so trees trained on earlier data stay valid.
+    New classes go at the end, which means `classes_` is not necessarily
+    sorted; codes are looked up through a dict rather than
+    `encoder.transform`.
+    """
+    new = np.setdiff1d(np.unique(ids), encoder.classes_)
+    encoder.classes_ = np.concatenate([encoder.classes_, new.astype(encoder.classes_.dtype)])
+    index = {int(v): i for i, v in enumerate(encoder.classes_)}
+    return np.fromiter((index[int(v)] for v in ids), dtype=np.int64, count=len(ids))
 
 
 class Command(BaseCommand):
     help = 'Train a model to predict click count based on user, card, and hour'
 
-    def handle(self, *args, **kwargs):
-        # Load interaction data
-        interactions = Interaction.objects.all()
-        if not interactions.exists():
-            self.stdout.write(self.style.WARNING("No interaction data found. Cannot train model."))
-            return
+    def add_arguments(self, parser):
+        parser.add_argument('--engine', choices=list(RANKERS), help='Ranking engine (default: the CARDS_RANKER setting)')
+        parser.add_argument('--skip-rankings', action='store_true', help='Do not rebuild the precomputed board rankings')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows fetched per database round trip')
+        parser.add_argument('--n-jobs', type=int, default=-1, help='Cores used to grow trees (-1 for all)')
+        parser.add_argument('--n-estimators', type=int, default=100, help='Trees in a full forest retrain')
+        parser.add_argument(
+            '--since', nargs='?', const='watermark', default=None,
+            help='Only ingest interactions updated after this ISO timestamp (default: the saved watermark) '
+                 'and fold them into the existing model',
+        )
+        parser.add_argument('--add-trees', type=int, default=20, help='Trees added per incremental forest run')
 
-        #  Prepare dataframe
-        data = []
-        for inter in interactions:
-            data.append({
-                'user_id': inter.user_id,
-                'card_id': inter.card_id,
-                'hour': inter.hour_range_start.hour,
-                'click_count': inter.click_count
-            })
-        df = pd.DataFrame(data)
+    def handle(self, *args, **kwargs):
+        model_path = settings.ML_MODEL_PATH
+        state_path = settings.ML_TRAINING_STATE_PATH
+        engine = kwargs['engine'] or get_ranker().name
+        previous = None
+        since = None
+        if kwargs['since'] is not None:
+            try:
+                previous = joblib.load(state_path)
+            except FileNotFoundError:
+                self.stdout.write(self.style.WARNING(" No existing model to grow; running a full retrain."))
+            else:
+                if 'ranker' not in previous:
+                    # Training state written before rankers were pluggable
+                    previous['ranker'] = ForestRanker.from_estimator(previous['model'])
+                if kwargs['engine'] and previous['ranker'].name != kwargs['engine']:
+                    raise CommandError(
+                        f"The saved model uses the '{previous['ranker'].name}' engine; "
+                        f"run a full retrain to switch to '{kwargs['engine']}'."
+                    )
+                engine = previous['ranker'].name
+                since = self.resolve_since(kwargs['since'], previous)
 
-        #  Group by user/card/hour to combine clicks
-        df = df.groupby(['user_id', 'card_id', 'hour'], as_index=False)['click_count'].sum()
+        # Pin the upper bound so rows written while training are left for the next run
+        watermark = Interaction.objects.aggregate(latest=Max('updated_at'))['latest']
 
-        #  Encode user/card as categorical
-        le_user = LabelEncoder()
-        le_card = LabelEncoder()
-        df['user_id'] = le_user.fit_transform(df['user_id'])
-        df['card_id'] = le_card.fit_transform(df['card_id'])
+        # Load aggregated interaction data
+        started = time.perf_counter()
+        user_ids, card_ids, hours, clicks = load_click_features(kwargs['chunk_size'], since, watermark)
+        elapsed = time.perf_counter() - started
+        peak = peak_memory_mib()
 
-        X = df[['user_id', 'card_id', 'hour']]
-        y = df['click_count']
+        if not len(clicks):
+            if since is not None:
+                self.stdout.write(self.style.WARNING(f"No interactions updated since {since}. Model left unchanged."))
+            else:
+                self.stdout.write(self.style.WARNING("No interaction data found. Cannot train model."))
+            return
 
-        #  Train/test split
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        self.stdout.write(
+            f" Loaded {len(clicks)} (user, card, hour) rows in {elapsed:.2f}s "
+            f"({len(clicks) / max(elapsed, 1e-9):,.0f} rows/sec, "
+            f"peak memory {'n/a' if peak is None else f'{peak:.1f} MiB'})"
+        )
 
-        # Train model
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
-        model.fit(X_train, y_train)
+        #  Encode user/card as categorical
+        X = np.empty((len(clicks), 3), dtype=np.float32)
+        if previous is not None:
+            le_user = previous['le_user']
+            le_card = previous['le_card']
+            X[:, 0] = extend_encoder(le_user, user_ids)
+            X[:, 1] = extend_encoder(le_card, card_ids)
+        else:
+            le_user = LabelEncoder()
+            le_card = LabelEncoder()
+            X[:, 0] = le_user.fit_transform(user_ids)
+            X[:, 1] = le_card.fit_transform(card_ids)
+        X[:, 2] = hours
+        y = clicks
 
-        #  Save model + encoders as bundle
-        model_dir = os.path.join(settings.BASE_DIR, 'cards', 'ml_models')
-        os.makedirs(model_dir, exist_ok=True)
+        # Train model: fold new rows into the existing one, or retrain from scratch
+        options = {'n_jobs': kwargs['n_jobs'], 'add_trees': kwargs['add_trees']}
+        started = time.perf_counter()
+        if previous is not None:
+            ranker = previous['ranker'].update(X, y, **options)
+        elif engine == ForestRanker.name:
+            ranker = ForestRanker(n_estimators=kwargs['n_estimators']).fit(X, y, **options)
+        else:
+            ranker = get_ranker(engine)().fit(X, y, **options)
+        self.stdout.write(f" Fitted {engine} ranker ({ranker.describe()}) in {time.perf_counter() - started:.2f}s")
 
-        bundle = {
-            "model": model,
+        #  Save the ranker for later incremental runs, then the compact serving bundle
+        state = {
+            "ranker": ranker,
             "le_user": le_user,
             "le_card": le_card,
+            "watermark": watermark,
         }
-        model_path = os.path.join(model_dir, 'click_model.pkl')
-        joblib.dump(bundle, model_path)
+        save_bundle(state, state_path)
+        save_bundle(serving_bundle(ranker, le_user, le_card, watermark=watermark), model_path)
 
         self.stdout.write(self.style.SUCCESS(f" Model trained and saved to {model_path}"))
+
+        if not kwargs['skip_rankings']:
+            call_command('build_board_rankings', stdout=self.stdout)
+
+    def resolve_since(self, value, previous):
+        """
+        Turn the --since value into an aware datetime.
+        """
+        if value == 'watermark':
+            since = previous.get('watermark')
+            if since is None:
+                raise CommandError("The saved training state has no watermark; pass --since <timestamp> explicitly.")
+            return since
+        since = parse_datetime(value)
+        if since is None:
+            raise CommandError(f"Invalid --since timestamp: {value}")
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
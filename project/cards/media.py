@@ -0,0 +1,151 @@
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.views.static import was_modified_since
+
+
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('audio/mpeg', '.mp3')
+
+# Names that embed a content hash (audio/tts/<sha256>.mp3, variants/.../<hash>/...)
+# never change, so clients may cache them forever
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{16,64}(/|\.)')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+CHUNK_SIZE = 64 * 1024
+
+
+def cache_control(path):
+    if HASHED_NAME.search(path):
+        return 'public, max-age=31536000, immutable'
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) inclusive for a single-range Range header, None to
+    serve the whole file, or False if the range cannot be satisfied.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None  # Malformed or multi-range: ignore and send everything
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iter_range(fh, start, length):
+    try:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT.
+
+    Answers conditional requests with 304 and single byte ranges with 206.
+    Content-hashed names are marked immutable. Behind nginx or Apache
+    (MEDIA_OFFLOAD_HEADER) the body is handed to the proxy; otherwise whole
+    files go out through FileResponse, which the WSGI server can send with
+    sendfile(). A .br/.gz sibling is sent instead when the client accepts it.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Not found")
+
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        not_modified = etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+    else:
+        not_modified = not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime)
+    if not_modified:
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    offload = settings.MEDIA_OFFLOAD_HEADER
+    if offload:
+        # The proxy sends the body and handles Range itself
+        response = HttpResponse(content_type=content_type)
+        if offload.lower() == 'x-accel-redirect':
+            response[offload] = settings.MEDIA_OFFLOAD_PREFIX.rstrip('/') + '/' + path
+        else:
+            response[offload] = full_path
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (if_range is None or if_range in (etag, headers['Last-Modified'])):
+        byte_range = parse_range(range_header, stat.st_size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    if byte_range is not None:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_range(open(full_path, 'rb'), start, end - start + 1),
+            status=206, content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        encoding, served_path = None, full_path
+        accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        for name, suffix in PRECOMPRESSED:
+            if name in accepted and os.path.isfile(full_path + suffix):
+                encoding, served_path = name, full_path + suffix
+                break
+        response = FileResponse(open(served_path, 'rb'), content_type=content_type)
+        response['Vary'] = 'Accept-Encoding'
+        if encoding:
+            response['Content-Encoding'] = encoding
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0007_card_owner'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('card_ids', models.JSONField(default=list, help_text='Board card ids, best first')),
+                ('scores', models.JSONField(default=list, help_text='Predicted clicks, aligned with card_ids')),
+                ('model_version', models.CharField(blank=True, max_length=64)),
+                ('built_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='board_rankings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'hour'), name='unique_user_hour_ranking')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def set_audio_status(apps, schema_editor):
+    # Cards with both tracks are ready; the rest get a generation task
+    Card = apps.get_model('cards', 'Card')
+    BackgroundTask = apps.get_model('cards', 'BackgroundTask')
+    complete = Card.objects.exclude(audio_ar__isnull=True).exclude(audio_ar='').exclude(audio_en__isnull=True).exclude(audio_en='')
+    complete.update(audio_status='ready')
+    BackgroundTask.objects.bulk_create([
+        BackgroundTask(name='cards.generate_card_audio', key=f'card-audio:{pk}', payload={'card_id': pk})
+        for pk in Card.objects.filter(audio_status='pending').values_list('pk', flat=True)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0009_board_version_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='audio_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='BackgroundTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('key', models.CharField(blank=True, db_index=True, help_text='Deduplicates queued work for the same object', max_length=200)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5)),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_at'], name='task_status_run_at')],
+            },
+        ),
+        migrations.RunPython(set_audio_status, migrations.RunPython.noop),
+    ]
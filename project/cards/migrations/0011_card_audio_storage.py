@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:09
+
+import cards.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0010_card_audio_status_backgroundtask'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='card',
+            name='audio_ar',
+            field=models.FileField(blank=True, null=True, storage=cards.storage.AudioStorage(), upload_to='audio/'),
+        ),
+        migrations.AlterField(
+            model_name='card',
+            name='audio_en',
+            field=models.FileField(blank=True, null=True, storage=cards.storage.AudioStorage(), upload_to='audio/'),
+        ),
+    ]
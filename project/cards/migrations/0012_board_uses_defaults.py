@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0011_card_audio_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='excluded_cards',
+            field=models.ManyToManyField(blank=True, help_text='Default cards removed from a board that uses defaults', related_name='excluded_from_boards', to='cards.card'),
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='uses_defaults',
+            field=models.BooleanField(default=False, help_text="Default cards are implicit members; `cards` then holds only the user's additions"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0012_board_uses_defaults'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies of image (see cards.images)'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies of image (see cards.images)'),
+        ),
+    ]
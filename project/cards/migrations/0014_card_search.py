@@ -0,0 +1,49 @@
+from django.db import migrations, models
+
+
+def fill_search_columns(apps, schema_editor):
+    from cards.search import search_columns
+
+    Card = apps.get_model('cards', 'Card')
+    batch = []
+    for card in Card.objects.only('pk', 'title_en', 'title_ar').iterator(chunk_size=2000):
+        card.search_en, card.search_ar = search_columns(card.title_en, card.title_ar)
+        batch.append(card)
+        if len(batch) >= 2000:
+            Card.objects.bulk_update(batch, ['search_en', 'search_ar'])
+            batch = []
+    Card.objects.bulk_update(batch, ['search_en', 'search_ar'])
+
+
+def create_index(apps, schema_editor):
+    from cards.search import ensure_search_index
+
+    ensure_search_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    from cards.search import drop_search_index
+
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0013_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='search_en',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Normalized title_en (see cards.search)'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='search_ar',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Normalized title_ar (see cards.search)'),
+        ),
+        migrations.RunPython(fill_search_columns, migrations.RunPython.noop),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:39
+
+from django.db import migrations, models
+
+
+def copy_timestamp(apps, schema_editor):
+    # The creation time is the best known update time of existing rows
+    Interaction = apps.get_model('cards', 'Interaction')
+    Interaction.objects.update(updated_at=models.F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0015_interaction_user_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interaction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, help_text='Last click increment (the incremental training watermark)'),
+        ),
+        migrations.RunPython(copy_timestamp, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,253 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import warnings
+from itertools import islice
+
+import joblib
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import ExtractHour
+
+from .models import Interaction
+from .rankers import get_ranker
+
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """
+    Return the sha256 hex digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_bundle(bundle, path):
+    """
+    Write a model bundle next to `path` and atomically move it into place,
+    so running workers never see a half-written file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_click_features(chunk_size=10000, since=None, until=None):
+    """
+    Aggregate clicks per (user, card, hour) in the database and stream the
+    grouped rows into preallocated typed arrays.
+
+    `since` and `until` select rows by their last update, so a row that
+    got more clicks is read again with its new total.
+    """
+    interactions = Interaction.objects.all()
+    if since is not None:
+        interactions = interactions.filter(updated_at__gt=since)
+    if until is not None:
+        interactions = interactions.filter(updated_at__lte=until)
+    rows = (
+        interactions
+        .annotate(hour=ExtractHour('hour_range_start'))
+        .values('user_id', 'card_id', 'hour')
+        .annotate(clicks=Sum('click_count'))
+        .order_by()
+        .values_list('user_id', 'card_id', 'hour', 'clicks')
+    )
+    total = rows.count()
+    user_ids = np.empty(total, dtype=np.int32)
+    card_ids = np.empty(total, dtype=np.int32)
+    hours = np.empty(total, dtype=np.int8)
+    clicks = np.empty(total, dtype=np.int32)
+
+    filled = 0
+    stream = rows.iterator(chunk_size=chunk_size)
+    while filled < total:
+        chunk = list(islice(stream, min(chunk_size, total - filled)))
+        if not chunk:
+            break
+        block = np.array(chunk, dtype=np.int64)
+        end = filled + len(block)
+        user_ids[filled:end] = block[:, 0]
+        card_ids[filled:end] = block[:, 1]
+        hours[filled:end] = block[:, 2]
+        clicks[filled:end] = block[:, 3]
+        filled = end
+
+    return user_ids[:filled], card_ids[:filled], hours[:filled], clicks[:filled]
+
+
+def serving_bundle(ranker, le_user, le_card, **extra):
+    """
+    Build the serving bundle: the ranker's exported arrays plus encoder
+    classes, all plain uncompressed arrays so joblib can memory-map them.
+    """
+    return {
+        "format": 2,
+        "engine": ranker.name,
+        ranker.name: ranker.export(),
+        "user_ids": np.asarray(le_user.classes_, dtype=np.int64),
+        "card_ids": np.asarray(le_card.classes_, dtype=np.int64),
+        **extra,
+    }
+
+
+def load_bundle(path):
+    """
+    Load a serving bundle with its arrays memory-mapped read-only.
+    """
+    return prepare_bundle(joblib.load(path, mmap_mode='r'))
+
+
+def prepare_bundle(bundle):
+    """
+    Attach the predictor and id -> code lookups to a loaded bundle.
+
+    Bundles saved before the compact format hold the sklearn model and
+    label encoders directly; both layouts are accepted.
+    """
+    if 'user_ids' in bundle:
+        engine = bundle.get('engine', 'forest')
+        bundle['model'] = get_ranker(engine).load(bundle[engine])
+        user_ids, card_ids = bundle['user_ids'], bundle['card_ids']
+    else:
+        user_ids, card_ids = bundle['le_user'].classes_, bundle['le_card'].classes_
+    bundle['user_index'] = {int(v): i for i, v in enumerate(user_ids)}
+    bundle['card_index'] = {int(v): i for i, v in enumerate(card_ids)}
+    return bundle
+
+
+def score_card_hours(bundle, user_id, card_ids, hours):
+    """
+    Predict click scores for every (hour, card) pair with one model.predict
+    call and return them as a len(hours) x len(card_ids) array.
+
+    Users unknown to the model get code -1, which tree splits treat like
+    the first encoded user and the count engine treats as no history;
+    cards unknown to the model score 0.
+    """
+    card_index = bundle['card_index']
+    codes = np.fromiter(
+        (card_index.get(card_id, -1) for card_id in card_ids),
+        dtype=np.int64, count=len(card_ids),
+    )
+    known = codes >= 0
+    scores = np.zeros((len(hours), len(codes)))
+    n_known = int(known.sum())
+    if n_known:
+        features = np.empty((len(hours) * n_known, 3))
+        features[:, 0] = bundle['user_index'].get(user_id, -1)
+        features[:, 1] = np.tile(codes[known], len(hours))
+        features[:, 2] = np.repeat(hours, n_known)
+        with warnings.catch_warnings():
+            # Older bundles were fitted on a DataFrame; scoring passes plain arrays
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            predicted = bundle['model'].predict(features)
+        scores[:, known] = predicted.reshape(len(hours), n_known)
+    return scores
+
+
+def score_cards(bundle, user_id, card_ids, hour):
+    """
+    Predict click scores for `card_ids` at a single hour.
+    """
+    return score_card_hours(bundle, user_id, card_ids, [hour])[0]
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the click-model bundle.
+
+    The bundle is loaded once per worker and reloaded when the file on disk
+    changes (checked by mtime, confirmed by content hash). The loaded bundle
+    and its version are swapped together, so requests that already hold a
+    bundle keep using it while a newer one is being loaded.
+    """
+
+    def __init__(self, path, check_interval=5):
+        self.path = path
+        self.check_interval = check_interval
+        self._state = (None, None)
+        self._mtime = None
+        self._next_check = 0.0
+        self._load_lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Content hash prefix of the loaded bundle, or None."""
+        return self._state[1]
+
+    def get(self):
+        """
+        Return the current bundle, or None if no model file exists.
+        """
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self.refresh()
+        return self._state[0]
+
+    def refresh(self):
+        """
+        Reload the bundle if the file changed since the last load.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._state = (None, None)
+            self._mtime = None
+            return
+        if mtime == self._mtime:
+            return
+
+        # Only the first load waits; later reloads are skipped while another
+        # thread is busy and the old bundle keeps being served meanwhile.
+        if not self._load_lock.acquire(blocking=self._state[0] is None):
+            return
+        try:
+            if mtime == self._mtime:
+                return
+            version = file_digest(self.path)[:12]
+            if version != self._state[1]:
+                bundle = load_bundle(self.path)
+                self._state = (bundle, version)
+                logger.info("Loaded click model %s from %s", version, self.path)
+            self._mtime = mtime
+        except Exception:
+            logger.exception("Failed to load click model from %s", self.path)
+        finally:
+            self._load_lock.release()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Return the process-wide model registry.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(
+                    settings.ML_MODEL_PATH,
+                    getattr(settings, 'ML_MODEL_CHECK_INTERVAL', 5),
+                )
+    return _registry
+
+
+def get_model_bundle():
+    """
+    Return the loaded click-model bundle, or None if there is no model.
+    """
+    return get_registry().get()
@@ -1,34 +1,45 @@
-import datetime
-import os
-import time
 from django.conf import settings
 from django.db import models
 from django.db import models
-from gtts import gTTS
+from django.utils import timezone
 import openai
 
 
 from users.models import User
 
+from .storage import AudioStorage
+
 
 class Category(models.Model):
     image = models.ImageField(upload_to='cards/')
     name_en = models.CharField(max_length=255,unique=True)
     name_ar = models.CharField(max_length=255,unique=True)
+    image_variants = models.JSONField(default=dict, blank=True, help_text="Resized copies of image (see cards.images)")
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name_en
 
 class Card(models.Model):
+    class AudioStatus(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        READY = 'ready', 'Ready'
+        FAILED = 'failed', 'Failed'
+
     image = models.ImageField(upload_to='cards/')
+    image_variants = models.JSONField(default=dict, blank=True, help_text="Resized copies of image (see cards.images)")
     title_en = models.CharField(max_length=255, unique=True)
     title_ar = models.CharField(max_length=255, unique=True)
-    audio_en = models.FileField(upload_to='audio/', blank=True, null=True)
-    audio_ar = models.FileField(upload_to='audio/', blank=True, null=True)
+    search_en = models.TextField(blank=True, default='', editable=False, help_text="Normalized title_en (see cards.search)")
+    search_ar = models.TextField(blank=True, default='', editable=False, help_text="Normalized title_ar (see cards.search)")
+    audio_en = models.FileField(upload_to='audio/', storage=AudioStorage(), blank=True, null=True)
+    audio_ar = models.FileField(upload_to='audio/', storage=AudioStorage(), blank=True, null=True)
+    audio_status = models.CharField(max_length=10, choices=AudioStatus.choices, default=AudioStatus.PENDING)
 
     is_default = models.BooleanField(default=False)  
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='cards')
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="cards")
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 
@@ -36,51 +47,117 @@ class Card(models.Model):
         return self.title_en
 
     def save(self, *args, **kwargs):
+        """
+        Save the card, refreshing its search columns, and queue generation
+        of any missing audio track; the TTS call itself runs in a background
+        worker (see cards.audio).
+        """
+        from .search import search_columns
+        self.search_en, self.search_ar = search_columns(self.title_en, self.title_ar)
+        needs_audio = not (self.audio_ar and self.audio_en)
+        # A failed card is retried on its next save, like an edited one
+        if needs_audio and self.audio_status != self.AudioStatus.PENDING:
+            self.audio_status = self.AudioStatus.PENDING
         super().save(*args, **kwargs)
 
-        updated = False
-
-        ar_path = f'media/audio/{self.id}_ar.mp3'
-        en_path = f'media/audio/{self.id}_en.mp3'
-
-        if not self.audio_ar:
-            if self.generate_tts(self.title_ar, 'ar', ar_path):
-                self.audio_ar.name = f'audio/{self.id}_ar.mp3'
-                updated = True
-
-        if not self.audio_en:
-            if self.generate_tts(self.title_en, 'en', en_path):
-                self.audio_en.name = f'audio/{self.id}_en.mp3'
-                updated = True
-
-        if updated:
-            super().save(update_fields=['audio_ar', 'audio_en'])
-
-    def generate_tts(self, text, lang, save_path):
-     try:
-        tts = gTTS(text=text, lang=lang)
-        
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        tts.save(save_path)
-
-        return True
-
-     except Exception as e:
-        print(f"Error generating TTS for {lang}: {e}")
-        return False
+        if needs_audio and self.audio_status == self.AudioStatus.PENDING:
+            from .tasks import enqueue
+            enqueue('cards.generate_card_audio', key=f'card-audio:{self.pk}', card_id=self.pk)
 
 class Board(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='board')
     cards = models.ManyToManyField(Card, related_name='boards', blank=True)
+    version = models.PositiveIntegerField(default=0, help_text="Bumped on every membership change")
+    uses_defaults = models.BooleanField(
+        default=False,
+        help_text="Default cards are implicit members; `cards` then holds only the user's additions",
+    )
+    excluded_cards = models.ManyToManyField(
+        Card, related_name='excluded_from_boards', blank=True,
+        help_text="Default cards removed from a board that uses defaults",
+    )
 
     def __str__(self):
         return f"{self.user.username}'s Board"
+
+    def get_cards(self):
+        """
+        Return the board's cards as a queryset that resolves in one query.
+
+        For boards that use defaults this is the default cards minus the
+        user's exclusions, plus the user's additions.
+        """
+        if not self.uses_defaults:
+            return self.cards.all()
+        added = Board.cards.through.objects.filter(board=self).values('card_id')
+        excluded = Board.excluded_cards.through.objects.filter(board=self).values('card_id')
+        return Card.objects.filter(
+            (models.Q(is_default=True) & ~models.Q(pk__in=excluded)) | models.Q(pk__in=added)
+        )
+
+    def add_cards(self, *cards):
+        """
+        Add cards to the board; on a board that uses defaults, a default
+        card is added by lifting its exclusion.
+        """
+        if self.uses_defaults:
+            defaults = [card for card in cards if card.is_default]
+            if defaults:
+                self.excluded_cards.remove(*defaults)
+            cards = [card for card in cards if not card.is_default]
+        if cards:
+            self.cards.add(*cards)
+
+    def remove_cards(self, *cards):
+        """
+        Remove cards from the board; on a board that uses defaults, a
+        default card is removed by excluding it.
+        """
+        if self.uses_defaults:
+            defaults = [card for card in cards if card.is_default]
+            if defaults:
+                self.excluded_cards.add(*defaults)
+        if cards:
+            self.cards.remove(*cards)
+
+    def set_cards(self, card_ids):
+        """
+        Make the board hold exactly the cards in `card_ids`.
+        """
+        if not self.uses_defaults:
+            self.cards.set(card_ids)
+            return
+        card_ids = set(card_ids)
+        defaults = set(Card.objects.filter(is_default=True).values_list('pk', flat=True))
+        self.excluded_cards.set(defaults - card_ids)
+        self.cards.set(card_ids - defaults)
     
 
+class BoardRanking(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='board_rankings')
+    hour = models.PositiveSmallIntegerField()
+    card_ids = models.JSONField(default=list, help_text="Board card ids, best first")
+    scores = models.JSONField(default=list, help_text="Predicted clicks, aligned with card_ids")
+    model_version = models.CharField(max_length=64, blank=True)
+    built_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user.username} ranking at {self.hour}:00"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'hour'],
+                name='unique_user_hour_ranking'
+            )
+        ]
+
+
 class Interaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='interactions')
     card = models.ForeignKey('Card', on_delete=models.CASCADE, related_name='interactions')
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, help_text="Last click increment (the incremental training watermark)")
 
     hour_range_start = models.TimeField()
     hour_range_end = models.TimeField()
@@ -89,12 +166,8 @@ class Interaction(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.hour_range_start or not self.hour_range_end:
-            now = datetime.now()
-            hour_start = time(hour=now.hour)
-            hour_end = (datetime.combine(now.date(), hour_start) + datetime.timedelta(hours=1)).time()
-
-            self.hour_range_start = hour_start
-            self.hour_range_end = hour_end
+            from .clicks import hour_range
+            self.hour_range_start, self.hour_range_end = hour_range()
 
         super().save(*args, **kwargs)
 
@@ -108,4 +181,34 @@ class Interaction(models.Model):
                 name='unique_user_card_hour'
             )
         ]
+        indexes = [
+            # Keyset pagination of a user's interactions
+            models.Index(fields=['user', 'id'], name='interaction_user_id'),
+        ]
+
+
+class BackgroundTask(models.Model):
+    """
+    A unit of work for the database-backed queue in cards.tasks.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        FAILED = 'failed', 'Failed'
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    key = models.CharField(max_length=200, blank=True, db_index=True, help_text="Deduplicates queued work for the same object")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
+    def __str__(self):
+        return f"{self.name} ({self.status}, attempt {self.attempts}/{self.max_attempts})"
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'], name='task_status_run_at')]
@@ -0,0 +1,83 @@
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import pagination
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class OffsetPagination(pagination.LimitOffsetPagination):
+    max_limit = settings.API_MAX_PAGE_SIZE
+
+
+class KeysetPagination(pagination.CursorPagination):
+    """
+    Cursor pagination on the primary key: every page is an index range
+    scan however deep it is, unlike OFFSET, which reads and discards every
+    earlier row.
+
+    Requests with ?limit= or ?offset= (clients written for limit/offset,
+    which also expect `count`) or a search (results are ranked, not in
+    key order) are paginated by offset instead.
+    """
+    ordering = 'id'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.offset_paginator = None
+        params = request.query_params
+        legacy = OffsetPagination.limit_query_param in params or OffsetPagination.offset_query_param in params
+        if legacy or params.get(api_settings.SEARCH_PARAM):
+            self.offset_paginator = OffsetPagination()
+            return self.offset_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class NewestFirstPagination(KeysetPagination):
+    ordering = '-id'
+
+
+class NDJSONExportMixin:
+    """
+    List views: ?export=ndjson streams every row of the (filtered) list as
+    newline-delimited JSON, for staff only. Rows are read in primary key
+    order, EXPORT_CHUNK_SIZE at a time, so memory use stays flat.
+    """
+    export_param = 'export'
+    # Serializer for exported rows; defaults to the view's serializer
+    export_serializer_class = None
+
+    def get_export_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.export_param) != 'ndjson':
+            return super().list(request, *args, **kwargs)
+        if not request.user.is_staff:
+            raise PermissionDenied("Only staff can export lists.")
+        queryset = self.get_export_queryset().order_by('pk')
+        name = queryset.model._meta.model_name
+        response = StreamingHttpResponse(self.export_rows(queryset), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{name}s.ndjson"'
+        return response
+
+    def export_rows(self, queryset):
+        last = None
+        while True:
+            chunk = queryset if last is None else queryset.filter(pk__gt=last)
+            rows = list(chunk[:settings.EXPORT_CHUNK_SIZE])
+            if not rows:
+                return
+            serializer_class = self.export_serializer_class or self.get_serializer_class()
+            data = serializer_class(rows, many=True, context=self.get_serializer_context()).data
+            yield ''.join(json.dumps(item, cls=JSONEncoder, ensure_ascii=False) + '\n' for item in data).encode()
+            last = rows[-1].pk
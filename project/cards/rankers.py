@@ -0,0 +1,261 @@
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+from sklearn.ensemble import RandomForestRegressor
+
+
+class BaseRanker:
+    """
+    Interface for click-ranking engines.
+
+    Engines are fitted on aggregated rows of (user code, card code, hour)
+    features with the summed click count as target. `export` returns plain
+    NumPy arrays for the serving bundle and `load` turns those arrays back
+    into a predictor with a `predict(X)` method. Options passed to `fit`
+    and `update` are engine specific; engines ignore the ones they don't use.
+    """
+
+    name = None
+
+    def fit(self, X, y, **options):
+        raise NotImplementedError
+
+    def update(self, X, y, **options):
+        """
+        Fold rows changed since the last run into an already fitted ranker.
+        Each row carries the current total of its (user, card, hour) cell,
+        not the clicks added since.
+        """
+        raise NotImplementedError
+
+    def describe(self):
+        return self.name
+
+    def export(self):
+        raise NotImplementedError
+
+    @classmethod
+    def load(cls, arrays):
+        raise NotImplementedError
+
+
+class CompactForest:
+    """
+    Read-only copy of a fitted RandomForestRegressor as flat NumPy arrays.
+
+    sklearn copies tree nodes into private buffers when unpickling, so a
+    pickled forest can't be shared between processes. These arrays can be
+    memory-mapped instead, leaving one page-cache copy for all workers.
+    Predictions match the estimator's.
+    """
+
+    fields = ('roots', 'children_left', 'children_right', 'feature', 'threshold', 'value')
+
+    def __init__(self, roots, children_left, children_right, feature, threshold, value):
+        # np.asarray drops the np.memmap subclass (and its per-index
+        # overhead) while still pointing at the shared mapping.
+        self.roots = np.asarray(roots)
+        self.children_left = np.asarray(children_left)
+        self.children_right = np.asarray(children_right)
+        self.feature = np.asarray(feature)
+        self.threshold = np.asarray(threshold)
+        self.value = np.asarray(value)
+
+    @classmethod
+    def from_estimator(cls, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        sizes = np.array([tree.node_count for tree in trees], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        def children(attr):
+            # Leaves keep -1; internal nodes point into the flat arrays.
+            return np.concatenate([
+                np.where(getattr(tree, attr) < 0, -1, getattr(tree, attr) + offset)
+                for tree, offset in zip(trees, offsets)
+            ]).astype(np.int32)
+
+        return cls(
+            roots=offsets.astype(np.int32),
+            children_left=children('children_left'),
+            children_right=children('children_right'),
+            feature=np.concatenate([tree.feature for tree in trees]).astype(np.int32),
+            threshold=np.concatenate([tree.threshold for tree in trees]),
+            value=np.concatenate([tree.value[:, 0, 0] for tree in trees]),
+        )
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in self.fields}
+
+    def predict(self, X):
+        # sklearn compares float32 features against float64 thresholds.
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.repeat(np.arange(len(X)), len(self.roots))
+        nodes = np.tile(self.roots, len(X)).astype(np.int64)
+        active = np.flatnonzero(self.children_left[nodes] >= 0)
+        while len(active):
+            current = nodes[active]
+            go_left = X[rows[active], self.feature[current]] <= self.threshold[current]
+            nodes[active] = np.where(go_left, self.children_left[current], self.children_right[current])
+            active = active[self.children_left[nodes[active]] >= 0]
+        return self.value[nodes].reshape(len(X), len(self.roots)).mean(axis=1)
+
+
+class ForestRanker(BaseRanker):
+    """
+    Random forest regressor over (user, card, hour), served as a
+    CompactForest.
+    """
+
+    name = 'forest'
+
+    def __init__(self, n_estimators=100, random_state=42):
+        self.n_estimators = n_estimators
+        self.random_state = random_state
+        self.model = None
+
+    @classmethod
+    def from_estimator(cls, model):
+        ranker = cls(n_estimators=model.n_estimators)
+        ranker.model = model
+        return ranker
+
+    def fit(self, X, y, n_jobs=-1, **options):
+        self.model = RandomForestRegressor(
+            n_estimators=self.n_estimators, random_state=self.random_state, n_jobs=n_jobs,
+        )
+        self.model.fit(X, y)
+        # Serving predicts a single board at a time; don't fan out threads per request
+        self.model.set_params(n_jobs=None)
+        return self
+
+    def update(self, X, y, n_jobs=-1, add_trees=20, **options):
+        """
+        Grow `add_trees` extra trees on the new rows with warm_start.
+        """
+        self.model.set_params(
+            warm_start=True,
+            n_estimators=self.model.n_estimators + add_trees,
+            n_jobs=n_jobs,
+        )
+        self.model.fit(X, y)
+        self.model.set_params(n_jobs=None)
+        return self
+
+    def describe(self):
+        return f"{self.model.n_estimators} trees"
+
+    def export(self):
+        return CompactForest.from_estimator(self.model).arrays()
+
+    @classmethod
+    def load(cls, arrays):
+        return CompactForest(**arrays)
+
+
+class CountRanker(BaseRanker):
+    """
+    Smoothed click-rate table with backoff.
+
+        score(u, c, h) = (n[u, c, h] + alpha * p[c, h]) / (1 + alpha)
+        p[c, h]        = (N[c, h] + beta * p[c]) / (U + beta)
+        p[c]           = N[c] / (24 * U)
+
+    n are the user's own clicks, N the clicks summed over all U users.
+    Per-user counts are kept as a sparse users x (cards * 24) matrix;
+    `update` overwrites the cells of the changed rows with their new totals.
+    """
+
+    name = 'counts'
+
+    def __init__(self, alpha=1.0, beta=10.0):
+        self.alpha = alpha
+        self.beta = beta
+        self.counts = None
+        self.card_hour = None
+
+    def fit(self, X, y, **options):
+        self.counts = None
+        return self.update(X, y)
+
+    def update(self, X, y, **options):
+        X = np.asarray(X, dtype=np.int64)
+        columns = X[:, 1] * 24 + X[:, 2]
+        shape = (int(X[:, 0].max()) + 1, int(columns.max()) // 24 * 24 + 24)
+        if self.counts is not None:
+            shape = (max(shape[0], self.counts.shape[0]), max(shape[1], self.counts.shape[1]))
+        counts = sparse.csr_matrix((np.asarray(y, dtype=np.float64), (X[:, 0], columns)), shape=shape)
+        counts.sum_duplicates()
+        if self.counts is not None:
+            previous = self.counts.copy()
+            previous.resize(shape)
+            # Drop the old totals of the cells being replaced
+            previous = previous - previous.multiply(counts.astype(bool))
+            counts = (counts + previous).tocsr()
+            counts.eliminate_zeros()
+        self.counts = counts
+
+        n_users = max(int((np.diff(counts.indptr) > 0).sum()), 1)
+        totals = np.asarray(counts.sum(axis=0)).reshape(-1, 24)
+        card_prior = totals.sum(axis=1, keepdims=True) / (24 * n_users)
+        self.card_hour = (totals + self.beta * card_prior) / (n_users + self.beta)
+        return self
+
+    def describe(self):
+        return f"{self.counts.nnz} user/card/hour cells"
+
+    def export(self):
+        index_dtype = np.int32 if self.counts.nnz < 2 ** 31 else np.int64
+        return {
+            'data': self.counts.data.astype(np.float64),
+            'indices': self.counts.indices.astype(index_dtype),
+            'indptr': self.counts.indptr.astype(index_dtype),
+            'shape': np.array(self.counts.shape, dtype=np.int64),
+            'card_hour': self.card_hour,
+            'alpha': np.array(self.alpha),
+        }
+
+    @classmethod
+    def load(cls, arrays):
+        ranker = cls(alpha=float(arrays['alpha']))
+        ranker.counts = sparse.csr_matrix(
+            (np.asarray(arrays['data']), np.asarray(arrays['indices']), np.asarray(arrays['indptr'])),
+            shape=tuple(int(n) for n in arrays['shape']),
+            copy=False,
+        )
+        ranker.card_hour = np.asarray(arrays['card_hour'])
+        return ranker
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.int64)
+        users, cards, hours = X[:, 0], X[:, 1], X[:, 2]
+        n_users, n_cards = self.counts.shape[0], self.card_hour.shape[0]
+        # Codes past the trained shape (-1, or ids encoded after the fit)
+        # have no history: unknown users fall back to p[c, h] and unknown
+        # cards to the average card's rate at that hour.
+        seen_cards = (cards >= 0) & (cards < n_cards)
+        prior = np.empty(len(X))
+        prior[seen_cards] = self.card_hour[cards[seen_cards], hours[seen_cards]]
+        prior[~seen_cards] = self.card_hour.mean(axis=0)[hours[~seen_cards]]
+        own = np.zeros(len(X))
+        known = seen_cards & (users >= 0) & (users < n_users)
+        if known.any():
+            own[known] = np.asarray(self.counts[users[known], cards[known] * 24 + hours[known]]).ravel()
+        return (own + self.alpha * prior) / (1 + self.alpha)
+
+
+RANKERS = {
+    ForestRanker.name: ForestRanker,
+    CountRanker.name: CountRanker,
+}
+
+
+def get_ranker(name=None):
+    """
+    Return the ranker class registered as `name`, or the one selected by
+    the CARDS_RANKER setting.
+    """
+    name = name or getattr(settings, 'CARDS_RANKER', ForestRanker.name)
+    try:
+        return RANKERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown ranker '{name}'. Choose one of: {', '.join(RANKERS)}")
@@ -0,0 +1,112 @@
+import bisect
+
+import numpy as np
+from django.utils import timezone
+
+from .boards import card_ids_by_board
+from .ml import score_card_hours, score_cards
+from .models import Board, BoardRanking
+
+
+HOURS = list(range(24))
+
+
+def build_rankings(bundle, model_version, batch_size=500):
+    """
+    Materialize every board's card order for each hour of the day.
+
+    Each user gets one BoardRanking row per hour holding the board's card
+    ids sorted by predicted clicks, plus the scores so cards added later
+    can be merged in without re-ranking the whole board. Returns the number
+    of boards ranked.
+    """
+    boards = list(Board.objects.order_by('id').values_list('id', 'user_id', 'uses_defaults'))
+    built = 0
+    for start in range(0, len(boards), batch_size):
+        batch = boards[start:start + batch_size]
+        chunk = {board_id: user_id for board_id, user_id, _ in batch}
+        board_cards = card_ids_by_board([(board_id, uses_defaults) for board_id, _, uses_defaults in batch])
+
+        now = timezone.now()
+        rows = []
+        for board_id, user_id in chunk.items():
+            card_ids = board_cards[board_id]
+            scores = score_card_hours(bundle, user_id, card_ids, HOURS) if card_ids else np.zeros((len(HOURS), 0))
+            for hour in HOURS:
+                order = np.argsort(-scores[hour], kind='stable')
+                rows.append(BoardRanking(
+                    user_id=user_id,
+                    hour=hour,
+                    card_ids=[card_ids[i] for i in order],
+                    scores=[float(scores[hour][i]) for i in order],
+                    model_version=model_version,
+                    built_at=now,
+                ))
+        BoardRanking.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user', 'hour'],
+            update_fields=['card_ids', 'scores', 'model_version', 'built_at'],
+        )
+        built += len(chunk)
+    return built
+
+
+def rank_board_cards(user, cards, hour, bundle, model_version):
+    """
+    Order `cards` using the precomputed ranking for (user, hour) and return
+    them with their scores.
+
+    Cards missing from the ranking (added since the last build) are scored
+    live and merged in. A ranking built by another model version is ignored
+    and the whole board is scored live.
+    """
+    ranking = (
+        BoardRanking.objects
+        .filter(user=user, hour=hour, model_version=model_version)
+        .values_list('card_ids', 'scores')
+        .first()
+    )
+    score_by_id = dict(zip(*ranking)) if ranking else {}
+
+    missing = [card.id for card in cards if card.id not in score_by_id]
+    if missing:
+        score_by_id.update(zip(missing, score_cards(bundle, user.id, missing, hour).tolist()))
+
+    scores = np.array([score_by_id[card.id] for card in cards])
+    order = np.argsort(-scores, kind='stable')
+    return [cards[i] for i in order], scores[order].tolist()
+
+
+def patch_rankings(user_id, added=(), removed=(), bundle=None, model_version=None):
+    """
+    Apply a board membership change to the user's precomputed rankings.
+
+    Removed cards are dropped and added cards are scored for all hours and
+    inserted in place, so only this user's rows are touched. Added cards
+    are left for the read path to score when no matching model is loaded.
+    """
+    rankings = list(BoardRanking.objects.filter(user_id=user_id).order_by('hour'))
+    if not rankings:
+        return
+
+    removed = set(removed)
+    added = [card_id for card_id in added if card_id not in removed]
+    can_score = bundle is not None and all(r.model_version == model_version for r in rankings)
+    added_scores = score_card_hours(bundle, user_id, added, HOURS) if added and can_score else None
+
+    for ranking in rankings:
+        pairs = [
+            (card_id, score)
+            for card_id, score in zip(ranking.card_ids, ranking.scores)
+            if card_id not in removed and card_id not in added
+        ]
+        if added_scores is not None:
+            negated = [-score for _, score in pairs]
+            for card_id, score in zip(added, added_scores[ranking.hour].tolist()):
+                position = bisect.bisect_right(negated, -score)
+                negated.insert(position, -score)
+                pairs.insert(position, (card_id, score))
+        ranking.card_ids = [card_id for card_id, _ in pairs]
+        ranking.scores = [score for _, score in pairs]
+    BoardRanking.objects.bulk_update(rankings, ['card_ids', 'scores'])
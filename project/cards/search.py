@@ -0,0 +1,158 @@
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework import filters
+
+
+FTS_TABLE = 'cards_card_fts'
+TRIGRAM_INDEXES = ('cards_card_search_en_trgm', 'cards_card_search_ar_trgm')
+
+ARABIC_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و',
+    'ة': 'ه',
+    'ـ': None,  # tatweel
+})
+WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    """
+    Fold text for matching: case-folded, diacritics (Arabic harakat and
+    Latin accents) removed and Arabic letter variants unified (alef forms,
+    alef maqsura/yaa, taa marbuta/haa).
+    """
+    text = unicodedata.normalize('NFKD', text or '').casefold()
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(WORD.findall(text.translate(ARABIC_LETTERS)))
+
+
+def strip_article(word):
+    # "القطه" and "وال..." are found by searching for "قطه"
+    for article in ('وال', 'بال', 'فال', 'ال'):
+        if word.startswith(article) and len(word) - len(article) >= 2:
+            return word[len(article):]
+    return word
+
+
+def search_columns(title_en, title_ar):
+    """
+    Return the (search_en, search_ar) column values for a card's titles.
+    Arabic words with the definite article are indexed both with and
+    without it.
+    """
+    arabic = normalize(title_ar).split()
+    extra = [strip_article(word) for word in arabic]
+    extra = [word for word, original in zip(extra, arabic) if word != original]
+    return normalize(title_en), ' '.join(arabic + extra)
+
+
+def query_tokens(query):
+    return [strip_article(token) for token in normalize(query).split()]
+
+
+def search_cards(queryset, query):
+    """
+    Filter `queryset` to cards matching every word of `query` as a prefix
+    (SQLite FTS5) or substring (Postgres trigram index) of either title,
+    best matches first.
+    """
+    tokens = query_tokens(query)
+    if not tokens:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'bm25({FTS_TABLE})'},
+            order_by=['search_rank', 'id'],
+        )
+    condition = Q()
+    for token in tokens:
+        condition &= Q(search_en__contains=token) | Q(search_ar__contains=token)
+    queryset = queryset.filter(condition)
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        from django.db.models.functions import Greatest
+        phrase = ' '.join(tokens)
+        return queryset.annotate(
+            search_rank=Greatest(TrigramWordSimilarity(phrase, 'search_en'), TrigramWordSimilarity(phrase, 'search_ar')),
+        ).order_by('-search_rank', 'id')
+    return queryset.order_by('id')
+
+
+class CardSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter replacement for cards backed by the search index, with
+    results ranked instead of in table order.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        return search_cards(queryset, query)
+
+
+def ensure_search_index(connection):
+    """
+    Create the card search index for this database if it is missing.
+
+    On SQLite this is an FTS5 table over the search columns kept in sync
+    by triggers; migrations that rebuild cards_card drop the triggers, so
+    this runs after every migrate and refills the index when it had to
+    recreate anything. On Postgres it is a trigram GIN index per column.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            triggers = {
+                f'{FTS_TABLE}_insert': (
+                    "AFTER INSERT ON cards_card BEGIN "
+                    f"INSERT INTO {FTS_TABLE}(rowid, search_en, search_ar) VALUES (new.id, new.search_en, new.search_ar); END"
+                ),
+                f'{FTS_TABLE}_delete': (
+                    "AFTER DELETE ON cards_card BEGIN "
+                    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_en, search_ar) "
+                    "VALUES ('delete', old.id, old.search_en, old.search_ar); END"
+                ),
+                f'{FTS_TABLE}_update': (
+                    "AFTER UPDATE OF search_en, search_ar ON cards_card BEGIN "
+                    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_en, search_ar) "
+                    "VALUES ('delete', old.id, old.search_en, old.search_ar); "
+                    f"INSERT INTO {FTS_TABLE}(rowid, search_en, search_ar) VALUES (new.id, new.search_en, new.search_ar); END"
+                ),
+            }
+            cursor.execute("SELECT name FROM sqlite_master WHERE name IN (%s)" % ', '.join(['%s'] * (len(triggers) + 1)),
+                           [FTS_TABLE, *triggers])
+            existing = {row[0] for row in cursor.fetchall()}
+            if existing == {FTS_TABLE, *triggers}:
+                return
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "search_en, search_ar, content='cards_card', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')"
+            )
+            for name, body in triggers.items():
+                cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for name, column in zip(TRIGRAM_INDEXES, ('search_en', 'search_ar')):
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON cards_card USING gin ({column} gin_trgm_ops)")
+
+
+def drop_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for suffix in ('insert', 'delete', 'update'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'postgresql':
+            for name in TRIGRAM_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
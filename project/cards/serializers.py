@@ -1,20 +1,30 @@
 from datetime import datetime, timedelta
 from rest_framework import serializers
+from drf_yasg.utils import swagger_serializer_method
 from cards.models import Category, Card, Board, Interaction
+from cards.clicks import get_click_buffer, hour_range
+from cards.images import variant_urls
 from users.models import User
 
 
 
 class CategorySerializer(serializers.ModelSerializer):
     """ Serializer for Category model """
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Category
-        fields = ['id','image', 'name_en', 'name_ar']
+        fields = ['id','image', 'image_variants', 'name_en', 'name_ar']
+
+    def get_image_variants(self, category):
+        # {"thumb": {"webp": url, "jpg": url}, ...}; empty until generated
+        return variant_urls(category.image_variants, category.image.storage, self.context.get('request'))
 
 
 class CardSerializer(serializers.ModelSerializer):
     """ Serializer for Card model """
     category = CategorySerializer(read_only=True)
+    image_variants = serializers.SerializerMethodField()
 
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -25,18 +35,30 @@ class CardSerializer(serializers.ModelSerializer):
     class Meta:
         model = Card
         fields = [
-            'id','image','title_en','title_ar','audio_en',
-            'audio_ar','category','category_id','is_default'     
+            'id','image','image_variants','title_en','title_ar','audio_en',
+            'audio_ar','audio_status','category','category_id','is_default'
         ]
+        read_only_fields = ['audio_status']
+
+    def get_image_variants(self, card):
+        return variant_urls(card.image_variants, card.image.storage, self.context.get('request'))
+
+
+class BoardCardSerializer(CardSerializer):
+    """ Card payload that reuses category data rendered once per board """
+    category = serializers.SerializerMethodField()
+
+    @swagger_serializer_method(serializer_or_field=CategorySerializer())
+    def get_category(self, card):
+        return self.context['categories'][card.category_id]
 
 
 class BoardSerializer(serializers.ModelSerializer):
     """ Serializer for Board model """
-    cards = CardSerializer(many=True, read_only=True)
+    cards = serializers.SerializerMethodField()
     
-    card_ids = serializers.PrimaryKeyRelatedField(
-        queryset=Card.objects.all(),
-        many=True,
+    card_ids = serializers.ListField(
+        child=serializers.IntegerField(),
         write_only=True,
         required=False
     )
@@ -45,11 +67,24 @@ class BoardSerializer(serializers.ModelSerializer):
         model = Board
         fields = ['id', 'cards', 'card_ids']
 
+    def validate_card_ids(self, value):
+        # Checked with one query instead of one lookup per id
+        found = set(Card.objects.filter(id__in=value).values_list('id', flat=True))
+        missing = [pk for pk in value if pk not in found]
+        if missing:
+            raise serializers.ValidationError(f'Invalid pk "{missing[0]}" - object does not exist.')
+        return value
+
+    @swagger_serializer_method(serializer_or_field=CardSerializer(many=True))
+    def get_cards(self, board):
+        # One query for the cards and their categories, however big the board
+        cards = board.get_cards().select_related('category')
+        return CardSerializer(cards, many=True, context=self.context).data
+
     def update(self, instance, validated_data):
         card_ids = validated_data.pop('card_ids', None)
         if card_ids is not None:
-            instance.cards.set(card_ids)
-        instance.save()
+            instance.set_cards(card_ids)
         return instance
     
 
@@ -66,15 +101,28 @@ class InteractionSerializer(serializers.ModelSerializer):
 
         validated_data.pop('user', None)
 
-        now = datetime.now().time().replace(minute=0, second=0, microsecond=0)
-
-        hour_start = validated_data.get('hour_range_start', now)
-        hour_end = validated_data.get('hour_range_end',
-            (datetime.combine(datetime.today(), hour_start) + timedelta(hours=1)).time())
+        if 'hour_range_start' in validated_data:
+            hour_start = validated_data['hour_range_start']
+            default_end = (datetime.combine(datetime.today(), hour_start) + timedelta(hours=1)).time()
+        else:
+            hour_start, default_end = hour_range()
+        hour_end = validated_data.get('hour_range_end', default_end)
 
         card = validated_data['card']
         click_count = validated_data.get('click_count', 1)
 
+        click_buffer = get_click_buffer()
+        if click_buffer is not None:
+            # Written behind by the buffer; the response echoes this increment
+            click_buffer.add(user.id, card.id, hour_start, hour_end, click_count)
+            return Interaction(
+                user=user,
+                card=card,
+                hour_range_start=hour_start,
+                hour_range_end=hour_end,
+                click_count=click_count,
+            )
+
         interaction, created = Interaction.objects.get_or_create(
             user=user,
             card=card,
@@ -91,6 +139,22 @@ class InteractionSerializer(serializers.ModelSerializer):
             interaction.save()
 
         return interaction
+
+
+class InteractionExportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Interaction
+        fields = ['id', 'user', 'card', 'timestamp', 'hour_range_start', 'hour_range_end', 'click_count']
+
+
+class InteractionEventSerializer(serializers.Serializer):
+    card = serializers.IntegerField()
+    timestamp = serializers.DateTimeField(required=False, help_text="When the taps happened (default: now)")
+    click_count = serializers.IntegerField(required=False, default=1, min_value=1)
+
+class InteractionBatchSerializer(serializers.Serializer):
+    events = InteractionEventSerializer(many=True)
+
 class AddCardToBoardSerializer(serializers.Serializer):
     id = serializers.IntegerField(required=True)
 
@@ -0,0 +1,108 @@
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from users.models import User
+
+from .catalog import invalidate_catalog
+from .images import IMAGE_FIELDS, delete_variant_files, needs_variants, queue_variants
+from .ml import get_registry
+from .models import Board, BoardRanking, Card, Category
+from .rankings import patch_rankings
+from .search import ensure_search_index
+
+
+@receiver(m2m_changed, sender=Board.cards.through)
+@receiver(m2m_changed, sender=Board.excluded_cards.through)
+def board_cards_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep precomputed rankings and board versions in step with board edits.
+
+    Covers add/remove/set/clear on board.cards and board.excluded_cards
+    (where adding an exclusion removes a default card from the board) from
+    either side of the relation and patches only the affected users.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    excluded = sender is Board.excluded_cards.through
+
+    if reverse:
+        # card.boards.<action>(...): instance is a Card, pk_set holds boards.
+        # After card.boards.clear() the boards are gone; their stale ranking
+        # entries are harmless because reads only look up board cards.
+        if pk_set is None:
+            return
+        user_ids = list(Board.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+        changed = {instance.pk}
+    else:
+        user_ids = [instance.user_id]
+        changed = pk_set or set()
+
+    # Invalidates cached board payloads (see cards.boards.board_version)
+    Board.objects.filter(user_id__in=user_ids).update(version=F('version') + 1)
+
+    if action == 'post_clear':
+        # Cleared exclusions bring defaults back; they are scored live
+        # until the next rebuild
+        if not reverse and not excluded:
+            BoardRanking.objects.filter(user_id__in=user_ids).delete()
+        return
+
+    registry = get_registry()
+    bundle = registry.get()
+    for user_id in user_ids:
+        if (action == 'post_add') != excluded:
+            patch_rankings(user_id, added=changed, bundle=bundle, model_version=registry.version)
+        else:
+            patch_rankings(user_id, removed=changed)
+
+
+@receiver([post_save, post_delete], sender=Card)
+@receiver([post_save, post_delete], sender=Category)
+def catalog_changed(sender, **kwargs):
+    """
+    Drop the cached catalog once the change is committed, so no request
+    can re-cache the old rows in between. Queryset update() and
+    bulk_create() send no signals; call invalidate_catalog() after those.
+    """
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=User)
+def image_saved(sender, instance, raw=False, **kwargs):
+    """
+    Queue resized variants whenever an image is uploaded or replaced.
+    """
+    if not raw and needs_variants(instance):
+        queue_variants(instance)
+
+
+@receiver(post_delete, sender=Card)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=User)
+def image_deleted(sender, instance, **kwargs):
+    # django_cleanup removes the original; the variants are ours to remove
+    image_field, variants_field = IMAGE_FIELDS[sender._meta.label]
+    variants = getattr(instance, variants_field)
+    storage = getattr(instance, image_field).storage
+    transaction.on_commit(lambda: delete_variant_files(variants, storage))
+
+
+@receiver(post_migrate)
+def search_index_migrated(sender, using, **kwargs):
+    """
+    Restore the card search index after migrations, which may have rebuilt
+    cards_card without its SQLite triggers.
+    """
+    if sender.name != 'cards':
+        return
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if 'cards_card' not in connection.introspection.table_names(cursor):
+            return
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, 'cards_card')}
+    if 'search_en' in columns:
+        ensure_search_index(connection)
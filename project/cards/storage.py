@@ -0,0 +1,38 @@
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+SHARED_AUDIO_PREFIX = 'audio/tts/'
+
+
+@deconstructible
+class AudioStorage(FileSystemStorage):
+    """
+    Media storage for card audio.
+
+    Files under SHARED_AUDIO_PREFIX are content-addressed and may back many
+    cards, so deleting one through a card (django_cleanup does that when a
+    card is deleted or its audio replaced) is ignored. The
+    dedupe_card_audio command removes them once nothing references them.
+    """
+
+    def delete(self, name):
+        if name and name.startswith(SHARED_AUDIO_PREFIX):
+            return
+        super().delete(name)
+
+    def delete_shared(self, name):
+        super().delete(name)
+
+    def save_shared(self, name, content):
+        """
+        Store `content` under exactly `name` unless that file already
+        exists, and return `name`.
+        """
+        if self.exists(name):
+            return name
+        saved = self.save(name, content)
+        if saved != name:
+            # Another worker wrote the same file first; keep theirs
+            super().delete(saved)
+        return name
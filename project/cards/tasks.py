@@ -0,0 +1,156 @@
+import logging
+import random
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import BackgroundTask
+
+
+logger = logging.getLogger(__name__)
+
+TaskSpec = namedtuple('TaskSpec', ['func', 'max_attempts', 'on_failure'])
+
+_handlers = {}
+
+
+def task(name, max_attempts=5, on_failure=None):
+    """
+    Register a function as the handler for tasks called `name`.
+
+    The handler is called with the task payload as keyword arguments and
+    retried with exponential backoff while it raises. `on_failure` is
+    called with the same arguments once the last attempt has failed.
+    """
+    def register(func):
+        _handlers[name] = TaskSpec(func, max_attempts, on_failure)
+        return func
+    return register
+
+
+def enqueue(name, key='', delay=0, **payload):
+    """
+    Queue task `name` with `payload` and return the new BackgroundTask.
+
+    The row is written in the caller's transaction, so it is only visible
+    to workers once that commits and disappears if it rolls back. With a
+    `key`, nothing is queued while an unstarted task with the same key is
+    waiting; that task is returned instead.
+
+    With BACKGROUND_TASKS_EAGER on, the task runs in-process right after
+    the commit instead (for development and tests without a worker).
+    """
+    if key:
+        waiting = BackgroundTask.objects.filter(key=key, status=BackgroundTask.Status.QUEUED, attempts=0).first()
+        if waiting is not None:
+            return waiting
+    spec = _handlers.get(name)
+    item = BackgroundTask.objects.create(
+        name=name,
+        key=key,
+        payload=payload,
+        max_attempts=spec.max_attempts if spec else 5,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        transaction.on_commit(lambda: run_task(item.pk))
+    return item
+
+
+def retry_delay(attempt):
+    """
+    Seconds to wait before retrying after failed attempt number `attempt`.
+    """
+    base = settings.BACKGROUND_TASK_RETRY_DELAY
+    delay = min(base * 2 ** (attempt - 1), settings.BACKGROUND_TASK_MAX_RETRY_DELAY)
+    # Jitter so tasks that failed together do not all retry together
+    return delay + random.uniform(0, delay / 10)
+
+
+def claim_tasks(limit):
+    """
+    Atomically mark up to `limit` due tasks as running and return their ids.
+
+    Each claim is a conditional UPDATE, so concurrent workers never run the
+    same task. Tasks left running longer than BACKGROUND_TASK_LOCK_TIMEOUT
+    (a worker died mid-task) are claimed again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.BACKGROUND_TASK_LOCK_TIMEOUT)
+    due = (
+        Q(status=BackgroundTask.Status.QUEUED, run_at__lte=now)
+        | Q(status=BackgroundTask.Status.RUNNING, locked_at__lt=stale)
+    )
+    candidates = list(BackgroundTask.objects.filter(due).order_by('run_at').values_list('pk', 'status', 'locked_at')[:limit])
+    claimed = []
+    for pk, status, locked_at in candidates:
+        updated = BackgroundTask.objects.filter(pk=pk, status=status, locked_at=locked_at).update(
+            status=BackgroundTask.Status.RUNNING,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(pk)
+    return claimed
+
+
+def run_task(pk):
+    """
+    Run one task. Success deletes the row; a failure schedules a retry or,
+    after the last attempt, marks it failed. Returns True on success.
+    """
+    item = BackgroundTask.objects.filter(pk=pk).first()
+    if item is None:
+        return False
+    if item.status == BackgroundTask.Status.QUEUED:
+        # Eager mode: nothing claimed the task through claim_tasks()
+        item.attempts += 1
+    spec = _handlers.get(item.name)
+    try:
+        if spec is None:
+            raise LookupError(f"No handler registered for task '{item.name}'")
+        spec.func(**item.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if spec is not None and item.attempts < item.max_attempts:
+            delay = retry_delay(item.attempts)
+            logger.warning("Task %s #%s failed (attempt %s/%s); retrying in %.0fs",
+                           item.name, pk, item.attempts, item.max_attempts, delay)
+            BackgroundTask.objects.filter(pk=pk).update(
+                status=BackgroundTask.Status.QUEUED,
+                attempts=item.attempts,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                locked_at=None,
+                last_error=error,
+            )
+        else:
+            logger.error("Task %s #%s failed permanently:\n%s", item.name, pk, error)
+            BackgroundTask.objects.filter(pk=pk).update(
+                status=BackgroundTask.Status.FAILED,
+                attempts=item.attempts,
+                locked_at=None,
+                last_error=error,
+            )
+            if spec is not None and spec.on_failure is not None:
+                try:
+                    spec.on_failure(**item.payload)
+                except Exception:
+                    logger.exception("on_failure hook of task %s #%s raised", item.name, pk)
+        return False
+    BackgroundTask.objects.filter(pk=pk).delete()
+    return True
+
+
+def run_pending(limit=10):
+    """
+    Claim and run up to `limit` due tasks. Returns the number run.
+    """
+    claimed = claim_tasks(limit)
+    for pk in claimed:
+        run_task(pk)
+    return len(claimed)
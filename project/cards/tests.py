@@ -1,3 +1,428 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from sklearn.preprocessing import LabelEncoder
+
+from users.models import User
+
+from . import ml
+from .boards import add_cards_to_all_boards
+from .catalog import get_default_card_data
+from .models import BackgroundTask, Board, BoardRanking, Card, Category, Interaction
+from .rankers import CountRanker
+from .rankings import HOURS, build_rankings
+from .tasks import run_pending
+from .tts import FakeTTSBackend
+
+
+def make_cards(category, count, start=0, **fields):
+    return Card.objects.bulk_create([
+        Card(image='cards/test.png', title_en=f'card {i}', title_ar=f'بطاقة {i}',
+             category=category, audio_status=Card.AudioStatus.READY, **fields)
+        for i in range(start, start + count)
+    ])
+
+
+class BoardRankingPatchTests(TestCase):
+    """
+    Board edits patch the user's precomputed rankings in place and the next
+    board read reflects them.
+    """
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(image='cards/test.png', name_en='Food', name_ar='طعام')
+        self.defaults = make_cards(category, 4, is_default=True)
+        self.extras = make_cards(category, 2, start=4)
+        self.cards = self.defaults + self.extras
+        self.user = User.objects.create_user(username='reem', email='reem@example.com', password='pw', verified=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        # Every hour, card i gets i + 1 clicks: later cards rank first
+        le_user = LabelEncoder().fit([self.user.id])
+        le_card = LabelEncoder().fit([card.id for card in self.cards])
+        codes = le_card.transform([card.id for card in self.cards])
+        X = np.array([(0, code, hour) for code in codes for hour in HOURS])
+        y = np.array([index + 1 for index in range(len(codes)) for _ in HOURS])
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'click_model.pkl')
+        ml.save_bundle(ml.serving_bundle(CountRanker().fit(X, y), le_user, le_card), path)
+
+        overridden = override_settings(ML_MODEL_PATH=path, ML_MODEL_CHECK_INTERVAL=0)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        ml._registry = None
+        self.addCleanup(setattr, ml, '_registry', None)
+
+    def make_board(self, uses_defaults=False):
+        board = Board.objects.create(user=self.user, uses_defaults=uses_defaults)
+        if not uses_defaults:
+            board.cards.set(self.defaults)
+        registry = ml.get_registry()
+        build_rankings(registry.get(), registry.version)
+        return board
+
+    def ids(self, *cards):
+        return [card.id for card in cards]
+
+    def assertRanked(self, expected):
+        rankings = BoardRanking.objects.filter(user=self.user).order_by('hour')
+        self.assertEqual([ranking.hour for ranking in rankings], HOURS)
+        for ranking in rankings:
+            self.assertEqual(ranking.card_ids, expected)
+            self.assertEqual(ranking.scores, sorted(ranking.scores, reverse=True))
+        response = self.client.get('/cards/board/with-categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([card['id'] for card in response.json()['cards']], expected)
+
+    def test_rankings_follow_predicted_clicks(self):
+        self.make_board()
+        d0, d1, d2, d3 = self.defaults
+        self.assertRanked(self.ids(d3, d2, d1, d0))
+
+    def test_added_card_is_inserted_in_place(self):
+        board = self.make_board()
+        d0, d1, d2, d3 = self.defaults
+        built = set(BoardRanking.objects.values_list('built_at', flat=True))
+        self.assertRanked(self.ids(d3, d2, d1, d0))
+
+        board.add_cards(self.extras[1])
+        self.assertRanked(self.ids(self.extras[1], d3, d2, d1, d0))
+        # Patched, not rebuilt
+        self.assertEqual(set(BoardRanking.objects.values_list('built_at', flat=True)), built)
+
+    def test_removed_card_is_dropped(self):
+        board = self.make_board()
+        d0, d1, d2, d3 = self.defaults
+        self.assertRanked(self.ids(d3, d2, d1, d0))
+
+        board.remove_cards(d2)
+        self.assertRanked(self.ids(d3, d1, d0))
+
+    def test_excluding_a_default_card_drops_it(self):
+        board = self.make_board(uses_defaults=True)
+        d0, d1, d2, d3 = self.defaults
+        self.assertRanked(self.ids(d3, d2, d1, d0))
+
+        board.remove_cards(d3)
+        self.assertEqual(list(board.excluded_cards.all()), [d3])
+        self.assertRanked(self.ids(d2, d1, d0))
+
+        # Lifting the exclusion puts the card back where it ranks
+        board.add_cards(d3, self.extras[0])
+        self.assertFalse(board.excluded_cards.exists())
+        self.assertRanked(self.ids(self.extras[0], d3, d2, d1, d0))
+
+    def test_other_users_rankings_are_untouched(self):
+        other = User.objects.create_user(username='omar', email='omar@example.com', password='pw', verified=True)
+        Board.objects.create(user=other).cards.set(self.defaults)
+        board = self.make_board()
+        before = list(BoardRanking.objects.filter(user=other).values_list('card_ids', flat=True))
+
+        board.remove_cards(self.defaults[0])
+        board.add_cards(self.extras[0])
+        self.assertEqual(list(BoardRanking.objects.filter(user=other).values_list('card_ids', flat=True)), before)
+
+
+class CountRankerTests(SimpleTestCase):
+
+    def test_codes_outside_the_trained_shape_get_priors(self):
+        X = np.array([(0, 0, 8), (0, 1, 8), (1, 1, 9)])
+        ranker = CountRanker().fit(X, np.array([4, 1, 2]))
+        known = ranker.predict(np.array([(-1, 1, 8)]))
+        # A user coded after the fit is scored like an unknown user
+        self.assertEqual(ranker.predict(np.array([(5, 1, 8)])).tolist(), known.tolist())
+        unseen = ranker.predict(np.array([(0, 7, 8), (-1, -1, 8)]))
+        expected = ranker.alpha * ranker.card_hour[:, 8].mean() / (1 + ranker.alpha)
+        self.assertTrue(np.allclose(unseen, expected))
+
+
+@override_settings(TIME_ZONE='Africa/Cairo', INTERACTION_FLUSH_INTERVAL=0)
+class InteractionHourTests(TestCase):
+    """
+    Single clicks, offline batches and the board read all bucket "now"
+    into the same local hour.
+    """
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(image='cards/test.png', name_en='Food', name_ar='طعام')
+        self.card, self.other_card = make_cards(category, 2)
+        self.user = User.objects.create_user(username='reem', email='reem@example.com', password='pw', verified=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # 22:30 UTC is 00:30 in Cairo
+        patcher = mock.patch('django.utils.timezone.now', return_value=datetime(2026, 3, 1, 22, 30, tzinfo=dt_timezone.utc))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_click_paths_share_the_local_hour(self):
+        response = self.client.post('/cards/interactions/', {'card': self.card.id, 'click_count': 1}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/cards/interactions/batch/', {'events': [{'card': self.card.id}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        Interaction.objects.create(user=self.user, card=self.other_card, click_count=1,
+                                   hour_range_start=None, hour_range_end=None)
+
+        Board.objects.create(user=self.user).cards.set([self.card])
+        rows = list(Interaction.objects.order_by('card').values_list('hour_range_start', 'hour_range_end', 'click_count'))
+        self.assertEqual(rows, [(time(0), time(1), 2), (time(0), time(1), 1)])
+        response = self.client.get('/cards/board/with-categories/')
+        self.assertEqual(response.json()['hour_used'], 0)
+
+
+@override_settings(ML_MODEL_PATH=os.path.join(tempfile.gettempdir(), 'no-click-model.pkl'))
+class BoardReadQueryTests(TestCase):
+    """
+    Reading a board costs the same number of queries however many cards
+    it holds.
+    """
+    SIZES = (10, 100, 1000)
+    PATHS = ('/cards/board/with-categories/', '/cards/board/', '/cards/default/')
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = [
+            Category.objects.create(image='cards/test.png', name_en=f'category {i}', name_ar=f'فئة {i}')
+            for i in range(20)
+        ]
+        cls.cards = []
+        for i, category in enumerate(categories):
+            cls.cards += make_cards(category, 50, start=i * 50, is_default=True)
+
+    def setUp(self):
+        ml._registry = None
+        self.addCleanup(setattr, ml, '_registry', None)
+
+    def board_client(self, size):
+        user = User.objects.create_user(username=f'user{size}', email=f'user{size}@example.com', password='pw', verified=True)
+        Board.objects.create(user=user).cards.set(self.cards[:size])
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_query_count_does_not_grow_with_board_size(self):
+        clients = {size: self.board_client(size) for size in (1, *self.SIZES)}
+        for path in self.PATHS:
+            cache.clear()
+            with CaptureQueriesContext(connection) as baseline:
+                clients[1].get(path)
+            for size in self.SIZES:
+                with self.subTest(path=path, size=size):
+                    cache.clear()
+                    with self.assertNumQueries(len(baseline)):
+                        response = clients[size].get(path)
+                    self.assertEqual(response.status_code, 200)
+                    if path != '/cards/default/':
+                        self.assertEqual(len(response.json()['cards']), size)
+
+    def test_board_cache_is_per_scheme(self):
+        client = self.board_client(1)
+        plain = client.get('/cards/board/')
+        secure = client.get('/cards/board/', secure=True, HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(secure.status_code, 200)
+        self.assertNotEqual(secure['ETag'], plain['ETag'])
+        self.assertTrue(plain.json()['cards'][0]['image'].startswith('http://'))
+        self.assertTrue(secure.json()['cards'][0]['image'].startswith('https://'))
+
+
+class DefaultCardFanOutTests(TestCase):
+    """
+    A new default card reaches every board in a fixed number of queries:
+    customized boards get a membership row, boards that use defaults
+    hold it implicitly.
+    """
+
+    def setUp(self):
+        self.category = Category.objects.create(image='cards/test.png', name_en='Food', name_ar='طعام')
+        self.boards = []
+
+    def add_boards(self, total):
+        start = len(self.boards)
+        users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com') for i in range(start, total)
+        ])
+        # Every other board uses defaults
+        self.boards += Board.objects.bulk_create([
+            Board(user=user, uses_defaults=i % 2 == 0) for i, user in enumerate(users, start)
+        ])
+
+    def test_fan_out_query_count_does_not_grow_with_boards(self):
+        for size in (10, 100, 1000):
+            self.add_boards(size)
+            card, = make_cards(self.category, 1, start=size, is_default=True)
+            with self.subTest(boards=size):
+                # Board id bounds, then INSERT ... SELECT and the version
+                # UPDATE inside one savepoint
+                with self.assertNumQueries(5):
+                    add_cards_to_all_boards([card.pk])
+
+                customized = [board for board in self.boards if not board.uses_defaults]
+                implicit = [board for board in self.boards if board.uses_defaults]
+                self.assertEqual(card.boards.count(), len(customized))
+                self.assertEqual(Board.objects.filter(pk__in=[b.pk for b in customized], version=0).count(), 0)
+                self.assertEqual(Board.objects.filter(pk__in=[b.pk for b in implicit]).exclude(version=0).count(), 0)
+                for board in (customized[0], customized[-1], implicit[0], implicit[-1]):
+                    self.assertTrue(board.get_cards().filter(pk=card.pk).exists())
+
+    def test_fan_out_skips_cards_already_on_the_board(self):
+        self.add_boards(4)
+        card, = make_cards(self.category, 1, is_default=True)
+        customized = self.boards[1]
+        customized.cards.add(card)
+        add_cards_to_all_boards([card.pk])
+        add_cards_to_all_boards([card.pk])
+        self.assertEqual(Board.cards.through.objects.filter(card=card).count(), 2)
+        self.assertTrue(customized.cards.filter(pk=card.pk).exists())
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(image='cards/test.png', name_en='Food', name_ar='طعام')
+        card, = make_cards(category, 1)
+        self.user = User.objects.create_user(username='reem', email='reem@example.com', password='pw', verified=True)
+        Interaction.objects.bulk_create([
+            Interaction(user=self.user, card=card, click_count=1,
+                        hour_range_start=time(hour), hour_range_end=time((hour + 1) % 24))
+            for hour in range(10)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_pages_by_default(self):
+        data = self.client.get('/cards/interactions/', {'page_size': 4}).json()
+        self.assertNotIn('count', data)
+        self.assertEqual(len(data['results']), 4)
+        second = self.client.get(data['next']).json()
+        self.assertEqual(len(second['results']), 4)
+        self.assertLess(second['results'][0]['id'], data['results'][-1]['id'])
+
+    def test_limit_or_offset_keeps_limit_offset_pages(self):
+        for params in ({'limit': 3}, {'offset': 3}, {'limit': 3, 'offset': 6}):
+            with self.subTest(params=params):
+                data = self.client.get('/cards/interactions/', params).json()
+                self.assertEqual(data['count'], 10)
+                self.assertEqual(len(data['results']), min(params.get('limit', 100), 10 - params.get('offset', 0)))
+
+
+class CatalogCacheTests(TestCase):
+    """
+    Changes made by another process (no invalidation in this one) reach
+    the cached catalog and new boards. Inside a TestCase on_commit hooks
+    never run, so invalidate_catalog() is never called here.
+    """
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(image='cards/test.png', name_en='Food', name_ar='طعام')
+        self.defaults = make_cards(category, 3, is_default=True)
+
+    def test_edits_elsewhere_reach_the_cached_catalog(self):
+        self.assertEqual([card['title_en'] for card in get_default_card_data()], ['card 0', 'card 1', 'card 2'])
+        Card.objects.filter(pk=self.defaults[1].pk).update(title_en='juice', updated_at=timezone.now())
+        self.assertEqual([card['title_en'] for card in get_default_card_data()], ['card 0', 'juice', 'card 2'])
+
+    def test_new_board_skips_a_deleted_default_card(self):
+        get_default_card_data()
+        Card.objects.filter(pk=self.defaults[0].pk).delete()
+        user = User.objects.create_user(username='reem', email='reem@example.com', password='pw', verified=True)
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/cards/board/with-categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(card['id'] for card in response.json()['cards']), self.ids(self.defaults[1:]))
+        self.assertEqual(len(get_default_card_data()), 2)
+
+    def ids(self, cards):
+        return sorted(card.id for card in cards)
+
+
+@override_settings(CARDS_TTS_BACKEND='cards.tts.FakeTTSBackend', BACKGROUND_TASKS_EAGER=False)
+class CardAudioTaskTests(TestCase):
+    """
+    Card audio goes through the task queue: saved as pending, made ready
+    by a worker, retried with backoff and marked failed once the retries
+    run out.
+    """
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overridden = override_settings(MEDIA_ROOT=media.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.category = Category.objects.create(image='cards/test.png', name_en='Food', name_ar='طعام')
+        self.card = Card(image='cards/test.png', title_en='water', title_ar='ماء', category=self.category)
+        self.card.save()
+        self.drop_image_tasks()
+
+    def drop_image_tasks(self):
+        # Saving queues image variant tasks too, with no image file to read
+        BackgroundTask.objects.exclude(name='cards.generate_card_audio').delete()
+
+    def task(self):
+        return BackgroundTask.objects.get(key=f'card-audio:{self.card.pk}')
+
+    def assertAudioReady(self):
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.audio_status, Card.AudioStatus.READY)
+        self.assertTrue(self.card.audio_en and self.card.audio_ar)
+        self.assertFalse(BackgroundTask.objects.exists())
+
+    def test_worker_generates_pending_audio(self):
+        self.assertEqual(self.card.audio_status, Card.AudioStatus.PENDING)
+        self.assertEqual(run_pending(), 1)
+        self.assertAudioReady()
+
+    def test_failures_back_off_then_mark_the_card_failed(self):
+        BackgroundTask.objects.update(max_attempts=2)
+        failing = mock.patch.object(FakeTTSBackend, 'synthesize', side_effect=OSError('TTS is down'))
+        with failing, self.assertLogs('cards', 'WARNING'):
+            started = timezone.now()
+            self.assertEqual(run_pending(), 1)
+            task = self.task()
+            self.assertEqual((task.status, task.attempts), (BackgroundTask.Status.QUEUED, 1))
+            self.assertIn('TTS is down', task.last_error)
+            self.assertGreaterEqual(task.run_at, started + timedelta(seconds=settings.BACKGROUND_TASK_RETRY_DELAY))
+            # Not due again until the backoff has passed
+            self.assertEqual(run_pending(), 0)
+            self.card.refresh_from_db()
+            self.assertEqual(self.card.audio_status, Card.AudioStatus.PENDING)
+
+            BackgroundTask.objects.update(run_at=timezone.now())
+            self.assertEqual(run_pending(), 1)
+        task = self.task()
+        self.assertEqual((task.status, task.attempts), (BackgroundTask.Status.FAILED, 2))
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.audio_status, Card.AudioStatus.FAILED)
+
+        # Saving the failed card queues it again
+        self.card.save()
+        self.drop_image_tasks()
+        self.assertEqual(self.card.audio_status, Card.AudioStatus.PENDING)
+        self.assertEqual(run_pending(), 1)
+        BackgroundTask.objects.filter(status=BackgroundTask.Status.FAILED).delete()
+        self.assertAudioReady()
+
+    def test_stale_locks_are_reclaimed(self):
+        now = timezone.now()
+        BackgroundTask.objects.update(status=BackgroundTask.Status.RUNNING, attempts=1, locked_at=now)
+        self.assertEqual(run_pending(), 0)
+        # The worker that claimed it died mid-task
+        stale = now - timedelta(seconds=settings.BACKGROUND_TASK_LOCK_TIMEOUT + 1)
+        BackgroundTask.objects.update(locked_at=stale)
+        self.assertEqual(run_pending(), 1)
+        self.assertAudioReady()
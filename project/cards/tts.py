@@ -0,0 +1,51 @@
+import hashlib
+import io
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from gtts import gTTS
+
+
+class GTTSBackend:
+    """
+    Google Translate text-to-speech. Needs network access.
+    """
+
+    def __init__(self, timeout=None, tld='com', slow=False):
+        self.timeout = timeout
+        self.tld = tld
+        self.slow = slow
+
+    @property
+    def voice(self):
+        """Identifies the voice settings; part of the audio cache key."""
+        return f"gtts:{self.tld}:{'slow' if self.slow else 'normal'}"
+
+    def synthesize(self, text, lang):
+        """
+        Return MP3 bytes for `text` spoken in `lang`.
+        """
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang, tld=self.tld, slow=self.slow, timeout=self.timeout).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class FakeTTSBackend:
+    """
+    Offline stand-in for tests and local development: returns a small
+    deterministic payload instead of real speech.
+    """
+    voice = 'fake'
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+
+    def synthesize(self, text, lang):
+        return b'FAKE-TTS ' + hashlib.sha256(f'{lang}:{text}'.encode()).hexdigest().encode()
+
+
+def get_tts_backend():
+    """
+    Return an instance of the backend named by the CARDS_TTS_BACKEND setting.
+    """
+    return import_string(settings.CARDS_TTS_BACKEND)(timeout=settings.CARDS_TTS_TIMEOUT)
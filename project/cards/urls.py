@@ -13,6 +13,7 @@ urlpatterns = [
     path('', include(router.urls)),
     path('board/', views.UserBoardView.as_view(), name='user-board'),
     path('board/with-categories/', views.board_with_categories, name='board-with-categories'),
+    path('board/bundle/', views.board_bundle, name='board-bundle'),
     path('board/add/', views.add_card_to_board, name='add-card-to-board'),
     path('board/remove/', views.remove_card_from_board, name='remove-card-from-board'),
     path('board/test/', views.test_card, name='test-card'),
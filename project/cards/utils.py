@@ -1,22 +1,16 @@
+from django.conf import settings
+
 from .models import Board, Card
 
 def create_board_with_initial_cards(user):
     """
     Create a board for the user with default cards.
     """
+    if settings.BOARDS_USE_DEFAULTS:
+        # Default cards are implicit members; nothing to copy
+        return Board.objects.create(user=user, uses_defaults=True)
     board = Board.objects.create(user=user)
-    default_cards = Card.objects.filter(is_default=True)
-    board.cards.set(default_cards)
+    # Read from the database, never the cache: a stale id of a deleted card
+    # would fail the insert
+    board.cards.set(Card.objects.filter(is_default=True).values_list('id', flat=True))
     return board
-
-import joblib
-from django.conf import settings
-
-def load_model():
-    try:
-        bundle = joblib.load(settings.ML_MODEL_PATH)
-        return bundle["model"], bundle["le_user"], bundle["le_card"]
-    except FileNotFoundError:
-        return None, None, None
-
-
@@ -1,20 +1,27 @@
 import random
-import os
-import joblib
-from datetime import datetime
 from django.db import models
 from rest_framework import viewsets, generics, permissions, status, filters
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.conf import settings
+from django.http import StreamingHttpResponse
 from rest_framework.exceptions import PermissionDenied
 
 from users.models import User
 
-from .models import Category, Card, Interaction, Board
-from .serializers import AddCardToBoardSerializer, CategorySerializer, CardSerializer, BoardSerializer, InteractionSerializer, RemoveCardFromBoardSerializer, StatsSerializer, TestCardSerializer, VerifyPinSerializer
+from .models import Category, Card, Interaction
+from .serializers import AddCardToBoardSerializer, CategorySerializer, CardSerializer, BoardSerializer, InteractionBatchSerializer, InteractionExportSerializer, InteractionSerializer, RemoveCardFromBoardSerializer, StatsSerializer, TestCardSerializer, VerifyPinSerializer
 from .utils import create_board_with_initial_cards
+from .catalog import get_category_data, get_default_card_data
+from .clicks import hour_range, ingest_click_events
+from .ml import get_registry
+from .rankings import rank_board_cards
+from .search import CardSearchFilter
+from .pagination import KeysetPagination, NDJSONExportMixin, NewestFirstPagination
+from .tasks import enqueue
+from .boards import add_cards_to_all_boards, board_version, build_board_payload, cached_json_response
+from .bundles import build_bundle, stream_bundle
 from .permissions import IsAdminOrCreateOnly
 from users.permissions import IsPremiumUser
 from drf_yasg.utils import swagger_auto_schema
@@ -50,16 +57,26 @@ class CategoryViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ['name_en', 'name_ar']
 
+    def list(self, request, *args, **kwargs):
+        # Searches go to the database; the plain listing is served from the catalog cache
+        if request.query_params.get(filters.SearchFilter.search_param):
+            return super().list(request, *args, **kwargs)
+        categories = get_category_data(request)
+        page = self.paginate_queryset(categories)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(categories)
 
-class CardViewSet(viewsets.ModelViewSet):
+
+class CardViewSet(NDJSONExportMixin, viewsets.ModelViewSet):
     """
     ViewSet to manage cards.
     """
     queryset = Card.objects.all()
     serializer_class = CardSerializer
     permission_classes = [IsAdminOrCreateOnly]
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
-    search_fields = ['title_en', 'title_ar']
+    pagination_class = KeysetPagination
+    filter_backends = [CardSearchFilter, DjangoFilterBackend]
     filterset_fields = ['category']
 
     def get_queryset(self):
@@ -67,9 +84,10 @@ class CardViewSet(viewsets.ModelViewSet):
         Return cards visible to the current user.
         """
         user = self.request.user
+        cards = Card.objects.select_related('category')
         if user.is_staff or user.is_superuser:
-            return Card.objects.all()
-        return Card.objects.filter(
+            return cards
+        return cards.filter(
             models.Q(owner=user) | models.Q(owner__isnull=True)
         )
 
@@ -81,9 +99,10 @@ class CardViewSet(viewsets.ModelViewSet):
         if user.is_staff or user.is_superuser:
             card = serializer.save()
             if self.request.data.get("is_default") in [True, "true", "True"]:
-                for board in Board.objects.all():
-                    board.cards.add(card)
-                    board.save()
+                if settings.BOARD_FANOUT_DEFERRED:
+                    enqueue('cards.add_cards_to_all_boards', card_ids=[card.pk])
+                else:
+                    add_cards_to_all_boards([card.pk])
             return
         if IsPremiumUser().has_permission(self.request, self):
             card = serializer.save(owner=user)
@@ -105,6 +124,14 @@ class UserBoardView(generics.RetrieveUpdateAPIView):
             return create_board_with_initial_cards(self.request.user)
         return self.request.user.board
 
+    def retrieve(self, request, *args, **kwargs):
+        board = self.get_object()
+        # Image URLs are absolute, so the scheme and host are part of the payload
+        version = board_version(board, request.build_absolute_uri('/'))
+        return cached_json_response(
+            request, f'board:{board.pk}', version, lambda: self.get_serializer(board).data,
+        )
+
 @swagger_auto_schema(
     method='post',
     request_body=AddCardToBoardSerializer,
@@ -133,7 +160,7 @@ def add_card_to_board(request):
     if not board:
         board = create_board_with_initial_cards(request.user)
 
-    board.cards.add(card)
+    board.add_cards(card)
     return Response({"status": True, "message": f"Card '{card.title_en}' added to board."}, status=status.HTTP_200_OK)
 
 
@@ -165,7 +192,7 @@ def remove_card_from_board(request):
     if not board:
         board = create_board_with_initial_cards(request.user)
 
-    board.cards.remove(card)
+    board.remove_cards(card)
     return Response({"status": True, "message": f"Card '{card.title_en}' removed from board."}, status=status.HTTP_200_OK)
 
 
@@ -175,54 +202,68 @@ def remove_card_from_board(request):
 def board_with_categories(request):
     """
     Return the current user's board cards and their categories, sorted by prediction if model exists.
+    Pass ?debug=1 to include each card's ranking score.
+
+    The response carries an ETag; send it back as If-None-Match to get a
+    304 while neither the board, its cards, the hour nor the model changed.
     """
     request.session.pop('pin_verified', None)
     user = request.user
     board = getattr(user, 'board', None) or create_board_with_initial_cards(user)
-    cards = list(board.cards.all())
-    if not cards:
-        return Response({"cards": [], "categories": []}, status=200)
-    current_hour = datetime.now().hour
-    bundle_path = os.path.join(settings.BASE_DIR, 'cards', 'ml_models', 'click_model.pkl')
-    if not os.path.exists(bundle_path):
-        categories = Category.objects.filter(cards__in=cards).distinct()
-        return Response({
-                "debug_cards": CardSerializer(cards, many=True).data,
-
-            "hour_used": current_hour,
-            "cards": CardSerializer(cards, many=True).data,
-            "categories": CategorySerializer(categories, many=True).data
-        }, status=200)
-    bundle = joblib.load(bundle_path)
-    model = bundle['model']
-    le_user = bundle['le_user']
-    le_card = bundle['le_card']
-    try:
-        user_enc = le_user.transform([user.id])[0]
-    except ValueError:
-        user_enc = 0
-        card_preds = []
-
-    for card in cards:
-        try:
-            card_enc = le_card.transform([card.id])[0]
-            features = [[user_enc, card_enc, current_hour]]
-            pred = model.predict(features)[0]
-        except ValueError:
-            print(f"Card ID {card.id} not found in label encoder.")
-            pred = 0
-        card_preds.append((card, pred)) 
-
-    if not card_preds:
-        cards_sorted = cards
-    else:
-        cards_sorted = [c for c, _ in sorted(card_preds, key=lambda x: x[1], reverse=True)]
-    categories = Category.objects.filter(cards__in=cards_sorted).distinct()
-    return Response({
-        "hour_used": current_hour,
-        "cards": CardSerializer(cards_sorted, many=True).data,
-        "categories": CategorySerializer(categories, many=True).data
-    }, status=200)
+    current_hour = hour_range()[0].hour
+    registry = get_registry()
+    bundle = registry.get()
+    model_version = registry.version if bundle is not None else None
+    debug = request.query_params.get('debug') in ('1', 'true', 'True')
+
+    def build():
+        cards = list(board.get_cards().select_related('category'))
+        if not cards:
+            return {"cards": [], "categories": []}
+        if bundle is None:
+            return build_board_payload(cards, current_hour, scores=[None] * len(cards) if debug else None)
+        cards_sorted, scores = rank_board_cards(user, cards, current_hour, bundle, model_version)
+        return build_board_payload(cards_sorted, current_hour, model_version, scores=scores if debug else None)
+
+    if debug:
+        return Response(build(), status=200)
+    version = board_version(board, current_hour, model_version)
+    return cached_json_response(request, f'board-with-categories:{board.pk}', version, build)
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('since', openapi.IN_QUERY, description="Version of the bundle the device already holds", type=openapi.TYPE_STRING),
+        openapi.Parameter('size', openapi.IN_QUERY, description="Image variant to ship instead of the originals", type=openapi.TYPE_STRING),
+    ],
+    responses={200: "Zip archive: manifest.json and the board's images and audio under media/"},
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def board_bundle(request):
+    """
+    Stream the current user's board as a zip for offline use.
+
+    The manifest lists every card and category with the archive paths of
+    their media. Pass the manifest's version back as ?since= to get only
+    the media that changed; `delta` in the manifest says whether that
+    worked or a full bundle was sent instead.
+    """
+    board = getattr(request.user, 'board', None) or create_board_with_initial_cards(request.user)
+    since = request.query_params.get('since') or None
+    if since is not None and not since.isdigit():
+        return Response({"status": False, "error": "since must be a bundle version."}, status=status.HTTP_400_BAD_REQUEST)
+    size = request.query_params.get('size', '')
+    if size and size not in settings.IMAGE_VARIANT_SIZES:
+        return Response({"status": False, "error": f"size must be one of {', '.join(settings.IMAGE_VARIANT_SIZES)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    manifest, files = build_bundle(board, since, size)
+    response = StreamingHttpResponse(stream_bundle(manifest, files), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="board-{manifest["version"]}.zip"'
+    response['X-Bundle-Version'] = manifest['version']
+    response['Cache-Control'] = 'private, no-store'
+    return response
 
 
 @swagger_auto_schema(
@@ -242,11 +283,11 @@ def test_card(request):
     if not card_id:
         return Response({"status": False, "error": "Please provide card_id."}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        target_card = Card.objects.get(id=card_id)
+        target_card = Card.objects.select_related('category').get(id=card_id)
     except Card.DoesNotExist:
         return Response({"status": False, "error": "Card not found."}, status=status.HTTP_404_NOT_FOUND)
     category_cards = list(
-        Card.objects.filter(category=target_card.category)
+        Card.objects.select_related('category').filter(category=target_card.category)
         .exclude(id=target_card.id)
         .filter(models.Q(owner=request.user) | models.Q(owner__isnull=True))
     )
@@ -263,18 +304,56 @@ def test_card(request):
     return Response({"status": True, "cards": CardSerializer(result_cards, many=True).data}, status=status.HTTP_200_OK)
 
 
-class InteractionViewSet(viewsets.ModelViewSet):
+class InteractionViewSet(NDJSONExportMixin, viewsets.ModelViewSet):
     """
     ViewSet to log and retrieve user interactions.
     """
     queryset = Interaction.objects.all()
     serializer_class = InteractionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NewestFirstPagination
+    export_serializer_class = InteractionExportSerializer
 
 
     def get_queryset(self):
         return Interaction.objects.filter(user=self.request.user)
 
+    def get_export_queryset(self):
+        # Staff export everyone's interactions
+        return Interaction.objects.all()
+
+    @swagger_auto_schema(
+        request_body=InteractionBatchSerializer,
+        responses={200: openapi.Response("Per-event status", examples={
+            "application/json": {"status": True, "accepted": 1, "rejected": 1, "results": [
+                {"index": 0, "status": "ok"},
+                {"index": 1, "status": "error", "error": "Card not found."},
+            ]}
+        })}
+    )
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """
+        Log many taps at once, e.g. replayed by a tablet after being offline.
+        Events are applied in one transaction; invalid events are reported
+        and skipped.
+        """
+        events = request.data.get('events') if isinstance(request.data, dict) else request.data
+        if not isinstance(events, list):
+            return Response({"status": False, "error": "Please provide a list of events."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = settings.INTERACTION_BATCH_MAX_EVENTS
+        if len(events) > limit:
+            return Response({"status": False, "error": f"At most {limit} events per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = ingest_click_events(request.user, events)
+        accepted = sum(1 for r in results if r["status"] == "ok")
+        return Response({
+            "status": True,
+            "accepted": accepted,
+            "rejected": len(results) - accepted,
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
 @swagger_auto_schema(method='get', responses={200: StatsSerializer})
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
@@ -305,6 +384,4 @@ def get_default_cards(request):
     """
     Get all default cards (those marked with is_default=True).
     """
-    default_cards = Card.objects.filter(is_default=True)
-    serializer = CardSerializer(default_cards, many=True, context={'request': request})
-    return Response({"cards": serializer.data}, status=status.HTTP_200_OK)
+    return Response({"cards": get_default_card_data(request)}, status=status.HTTP_200_OK)
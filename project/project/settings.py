@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from datetime import timedelta
 import os
+import sys
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -97,6 +98,26 @@ DATABASES = {
     }
 }
 
+# Shared cache for the card catalog and rendered boards. Per-process memory
+# by default (also what the test runner uses); set REDIS_URL in production so
+# all workers share one cache (requires the `redis` package).
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL and 'test' not in sys.argv[1:2]:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'tawasul',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tawasul',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,6 +165,15 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Media served by cards.media.serve_media. Files without a content hash in
+# their name are cached for this many seconds; hashed ones are immutable.
+MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', 3600))
+# Behind a proxy, let it send the file: 'X-Accel-Redirect' (nginx, with
+# MEDIA_OFFLOAD_PREFIX naming an internal location aliased to MEDIA_ROOT)
+# or 'X-Sendfile' (Apache mod_xsendfile, lighttpd)
+MEDIA_OFFLOAD_HEADER = os.getenv('MEDIA_OFFLOAD_HEADER', '')
+MEDIA_OFFLOAD_PREFIX = os.getenv('MEDIA_OFFLOAD_PREFIX', '/protected-media/')
+
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
@@ -154,9 +184,13 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
-    'PAGE_SIZE': 500,
+    'DEFAULT_PAGINATION_CLASS': 'cards.pagination.OffsetPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', 100)),
 }
+# Upper bound for ?limit= and ?page_size= on paginated lists
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 1000))
+# Rows serialized per query when staff export a list with ?export=ndjson
+EXPORT_CHUNK_SIZE = 2000
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=15),
@@ -184,5 +218,56 @@ PAYMOB_IFRAME_ID = int(os.getenv("PAYMOB_IFRAME_ID"))
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Click model bundle, loaded once per worker and reloaded when the file changes
+ML_MODEL_PATH = os.path.join(BASE_DIR, 'cards', 'ml_models', 'click_model.pkl')
+# Full estimator kept for incremental (warm-start) training; not loaded by workers
+ML_TRAINING_STATE_PATH = os.path.join(BASE_DIR, 'cards', 'ml_models', 'click_model_state.pkl')
+ML_MODEL_CHECK_INTERVAL = int(os.getenv('ML_MODEL_CHECK_INTERVAL', 5))
+# Ranking engine trained by train_click_model: 'forest' or 'counts' (see cards.rankers)
+CARDS_RANKER = os.getenv('CARDS_RANKER', 'forest')
+
+# Click POSTs are summed in memory and upserted every N seconds (0 writes each click directly)
+INTERACTION_FLUSH_INTERVAL = float(os.getenv('INTERACTION_FLUSH_INTERVAL', 2))
+INTERACTION_BUFFER_MAX_PENDING = int(os.getenv('INTERACTION_BUFFER_MAX_PENDING', 1000))
+# Buffered rows are dropped after this many failed flushes (e.g. a long database outage)
+INTERACTION_FLUSH_MAX_ATTEMPTS = int(os.getenv('INTERACTION_FLUSH_MAX_ATTEMPTS', 3))
+INTERACTION_BATCH_MAX_EVENTS = int(os.getenv('INTERACTION_BATCH_MAX_EVENTS', 10000))
+
+# Rendered board payloads are cached under their version key (ETag) for this many seconds
+BOARD_CACHE_TIMEOUT = int(os.getenv('BOARD_CACHE_TIMEOUT', 3600))
+# Default cards and categories are cached pre-serialized, keyed on the card and category
+# tables' row counts and latest updates, so edits from any process are seen at once
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 24 * 3600))
+
+# Card audio is generated by the run_tasks worker; FakeTTSBackend works offline
+CARDS_TTS_BACKEND = os.getenv('CARDS_TTS_BACKEND', 'cards.tts.GTTSBackend')
+CARDS_TTS_TIMEOUT = float(os.getenv('CARDS_TTS_TIMEOUT', 15))
+
+# Database-backed task queue (cards.tasks). Eager mode runs tasks in-process
+# after commit, for development without a worker.
+BACKGROUND_TASKS_EAGER = os.getenv('BACKGROUND_TASKS_EAGER', '') in ('1', 'true', 'True')
+BACKGROUND_TASK_POLL_INTERVAL = float(os.getenv('BACKGROUND_TASK_POLL_INTERVAL', 1))
+BACKGROUND_TASK_RETRY_DELAY = 10
+BACKGROUND_TASK_MAX_RETRY_DELAY = 3600
+# Running tasks older than this are assumed orphaned by a dead worker and run again
+BACKGROUND_TASK_LOCK_TIMEOUT = 600
+
+# New default cards are inserted into boards this many boards per statement;
+# deferred mode hands the insert to the run_tasks worker
+BOARD_FANOUT_CHUNK_SIZE = int(os.getenv('BOARD_FANOUT_CHUNK_SIZE', 50000))
+BOARD_FANOUT_DEFERRED = os.getenv('BOARD_FANOUT_DEFERRED', '') in ('1', 'true', 'True')
+# New boards get default cards implicitly instead of a copy of every default
+# (convert existing boards with `manage.py convert_boards`)
+BOARDS_USE_DEFAULTS = os.getenv('BOARDS_USE_DEFAULTS', '') in ('1', 'true', 'True')
+
+# Card, category and profile images get these resized copies (longest side in
+# pixels), each as WebP plus a JPEG/PNG fallback, rendered by the run_tasks worker
+IMAGE_VARIANT_SIZES = {'thumb': 128, 'small': 256, 'medium': 512}
+IMAGE_VARIANT_QUALITY = 80
+
+# How long the contents of an offline board bundle are remembered, so a
+# device can ask for a delta against it (?since=)
+BOARD_BUNDLE_HISTORY_TIMEOUT = int(os.getenv('BOARD_BUNDLE_HISTORY_TIMEOUT', 30 * 24 * 3600))
+
 
 TAWASUL_URL = os.getenv('TAWASUL_URL', 'http://localhost:5173')
\ No newline at end of file
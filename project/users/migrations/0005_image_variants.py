@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_is_subscription_cancelled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies of profile_picture (see cards.images)'),
+        ),
+    ]
@@ -20,6 +20,7 @@ class User(AbstractUser):
     first_name = models.CharField(max_length=30, blank=True)
     last_name = models.CharField(max_length=30, blank=True)
     profile_picture = models.ImageField(default='default.jpg', upload_to='profile_pictures/', blank=True, null=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, help_text="Resized copies of profile_picture (see cards.images)")
     verified = models.BooleanField(default=False)
     address = models.CharField(max_length=100, blank=True)
     birth_date = models.DateField(default=date(2000, 1, 1))
@@ -5,6 +5,7 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import User
 from django.core.validators import RegexValidator
 from django.contrib.auth.password_validation import validate_password
+from cards.images import variant_urls
 
 class LoginSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
@@ -49,15 +50,19 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     is_premium = serializers.SerializerMethodField()
+    profile_picture_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ["id", "username", "email", "first_name", "last_name", "profile_picture", "address", "birth_date", "phone", "account_type", "is_premium"]
+        fields = ["id", "username", "email", "first_name", "last_name", "profile_picture", "profile_picture_variants", "address", "birth_date", "phone", "account_type", "is_premium"]
         read_only_fields = ["id", "username", "email", "account_type", "is_premium"]
 
     def get_is_premium(self, obj):
         return obj.is_premium
 
+    def get_profile_picture_variants(self, obj):
+        return variant_urls(obj.profile_picture_variants, obj.profile_picture.storage, self.context.get('request'))
+
 class UserUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -70,14 +75,23 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         return value
 
 class UserListSerializer(serializers.ModelSerializer):
+    is_premium = serializers.SerializerMethodField()
     cards_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'account_type', 'premium_expiry', 'is_premium', 'cards_count']
 
+    def get_is_premium(self, user):
+        # Annotated by UserListView; computed per user otherwise
+        if hasattr(user, 'premium_active'):
+            return user.premium_active
+        return user.is_premium
+
     def get_cards_count(self, user):
+        if hasattr(user, 'board_card_count'):
+            return user.board_card_count
         board = getattr(user, 'board', None)
         if board:
-            return board.cards.count()
+            return board.get_cards().count()
         return 0
@@ -1,3 +1,81 @@
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cards.models import Board, Card, Category
+
+from .models import User
+
+
+class UserListTests(TestCase):
+    """
+    The admin user list annotates card counts and premium status in the
+    page query, so its cost does not grow with the number of users.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(image='cards/test.png', name_en='Food', name_ar='طعام')
+        self.cards = Card.objects.bulk_create([
+            Card(image='cards/test.png', title_en=f'card {i}', title_ar=f'بطاقة {i}',
+                 category=category, is_default=i < 6, audio_status=Card.AudioStatus.READY)
+            for i in range(10)
+        ])
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pw', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.added = 0
+
+    def add_users(self, count):
+        now = timezone.now()
+        start, self.added = self.added, self.added + count
+        # Cycles through: no board and an active premium; a copied board
+        # and an expired premium; a board using defaults (with an addition
+        # and an exclusion) and a free account
+        users = User.objects.bulk_create([
+            User(
+                username=f'user{i}', email=f'user{i}@example.com',
+                account_type='free' if i % 3 == 2 else 'premium',
+                premium_expiry=now + timedelta(days=10) if i % 3 == 0 else now - timedelta(days=1),
+            )
+            for i in range(start, start + count)
+        ])
+        for i, user in enumerate(users, start):
+            if i % 3 == 1:
+                Board.objects.create(user=user).cards.set(self.cards[:i % 7 + 1])
+            elif i % 3 == 2:
+                board = Board.objects.create(user=user, uses_defaults=True)
+                board.cards.add(self.cards[9])
+                board.excluded_cards.add(self.cards[0])
+
+    def list_users(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/users/all-users/', {'page_size': 1000})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()['results']
+
+    def test_query_count_does_not_grow_with_users(self):
+        self.add_users(6)
+        expected, _ = self.list_users()
+        for total in (30, 120):
+            self.add_users(total - self.added)
+            with self.subTest(users=total):
+                with self.assertNumQueries(expected):
+                    response = self.client.get('/users/all-users/', {'page_size': 1000})
+                # Plus the admin
+                self.assertEqual(len(response.json()['results']), total + 1)
 
-# Create your tests here.
+    def test_annotations_match_the_model(self):
+        self.add_users(12)
+        _, rows = self.list_users()
+        users = {user.pk: user for user in User.objects.select_related('board')}
+        self.assertEqual(len(rows), len(users))
+        for row in rows:
+            user = users[row['id']]
+            board = getattr(user, 'board', None)
+            with self.subTest(user=user.username):
+                self.assertEqual(row['cards_count'], board.get_cards().count() if board else 0)
+                self.assertEqual(row['is_premium'], user.is_premium)
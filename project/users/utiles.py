@@ -3,9 +3,6 @@ from datetime import datetime, timedelta, timezone
 from django.conf import settings
 from django.core.mail import send_mail
 from django.urls import reverse
-import joblib
-import os
-from django.conf import settings
 from django.utils.timezone import now
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
@@ -109,14 +106,6 @@ def send_password_reset_email(user, request):
 
     email.send()
 
-MODEL_PATH = os.path.join(settings.BASE_DIR, 'cards', 'ml_models', 'click_model.pkl')
-
-def load_model():
-    if os.path.exists(MODEL_PATH):
-        return joblib.load(MODEL_PATH)
-    else:
-        raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
-
 def activate_premium(user):
     user.account_type = 'premium'
     user.premium_expiry = now() + timedelta(days=30) 
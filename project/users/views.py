@@ -13,9 +13,13 @@ from .utiles import send_activation_email, send_password_reset_email ,activate_p
 from .serializers import RegisterSerializer, LoginSerializer, UserListSerializer, UserProfileSerializer, UserUpdateSerializer
 from users.permissions import IsPremiumUser
 from django.conf import settings
+from django.db.models import BooleanField, Case, Value, When
+from django.utils import timezone
 from django.shortcuts import redirect
 import requests
 from cards.utils import create_board_with_initial_cards
+from cards.boards import annotate_board_card_counts
+from cards.pagination import KeysetPagination, NDJSONExportMixin
 from drf_yasg.utils import swagger_auto_schema
 
 
@@ -222,7 +226,19 @@ class SubscriptionStatusView(APIView):
         }, status=status.HTTP_200_OK)  
 
 
-class UserListView(ListAPIView):
+class UserListView(NDJSONExportMixin, ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserListSerializer
-    permission_classes = [IsAdminUser]
\ No newline at end of file
+    permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        # Card counts and premium status come from the page query itself
+        # instead of two queries per user
+        return annotate_board_card_counts(User.objects.all()).annotate(
+            premium_active=Case(
+                When(account_type='premium', premium_expiry__gt=timezone.now(), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+        )
\ No newline at end of file